@@ -11,23 +11,40 @@ the longer moving average and sells when the opposite occurs.
 @requires pandas
 @requires backtesting
 @requires save_backtest
+@requires cost_model
+@requires incremental_backtest
 """
 
+import os
 import sys
-from backtesting import Backtest, Strategy
+from backtesting import Strategy
 from backtesting.lib import crossover
 import pandas as pd
 from backtesting.test import SMA
 from save_backtest import save_backtest
+from cost_model import FxCostModel
+from incremental_backtest import IncrementalBacktest
 
-def run_backtest(folderPath):
+def run_backtest(folderPath, checkpointPath=None, data=None):
     """
     Runs the backtest on the historical data contained in the specified CSV file.
 
+    If a checkpoint from an earlier run on the same data exists, only the bars
+    appended since then are backtested.
+
     @param folderPath: str - The path to the folder containing the data.csv file.
+    @param checkpointPath: str - The checkpoint file, by default results/checkpoint.pkl
+                                 in the folder. server.js sets one kept across runs
+                                 with the same asset, interval and start date, passed
+                                 in by pipeline.py or through BACKTEST_CHECKPOINT.
+    @param data: DataFrame - The data to backtest, as passed in by pipeline.py.
+                             Read from data.csv if not given.
     """
-    # Read CSV file provided as an argument
-    df = pd.read_csv(folderPath + "/data.csv")
+    if checkpointPath is None:
+        checkpointPath = os.path.join(folderPath, "results", "checkpoint.pkl")
+
+    # Read CSV file provided as an argument, unless the data was passed in-process
+    df = data if data is not None else pd.read_csv(folderPath + "/data.csv")
 
     class SmaCross(Strategy):
         """
@@ -53,16 +70,21 @@ def run_backtest(folderPath):
                 self.sell()
 
     # Run backtest on the data read from the CSV file
-    bt = Backtest(df, SmaCross, commission=.002, exclusive_orders=True)
-    save_backtest(bt, folderPath)
+    # Trading costs come from the FX cost model rather than a percentage commission
+    bt = IncrementalBacktest(df, SmaCross, checkpoint_path=checkpointPath, exclusive_orders=True)
+    # EUR/USD spread, slippage and overnight swap, traded in micro lots
+    costs = FxCostModel(spread_pips=1.0, slippage_pips=0.2, swap_long_pips=0.6,
+                        swap_short_pips=-0.3, lot_size=1000)
+    save_backtest(bt, folderPath, cost_model=costs)
 
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print("Usage: python test.py <csv_file_name>")
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python test.py <csv_file_name> [checkpoint_file]")
         sys.exit(1)
 
     # Get the file name from the command line argument
     folderPath = sys.argv[1]
+    checkpointPath = sys.argv[2] if len(sys.argv) == 3 else os.environ.get('BACKTEST_CHECKPOINT')
     
     # Run the backtest with the given file name
-    run_backtest(folderPath)
+    run_backtest(folderPath, checkpointPath)
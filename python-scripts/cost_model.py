@@ -0,0 +1,220 @@
+"""
+FX Cost Model
+
+This module applies realistic FX trading costs to the results of a backtest:
+the bid/ask spread (per bar or per trading session), pip based slippage,
+overnight swap charged on held positions and rounding of position sizes to
+whole lots. All costs are computed over the trade and equity arrays in bulk,
+so enabling the model adds negligible runtime even on minute data.
+
+@module CostModel
+@requires numpy
+@requires pandas
+@requires backtesting
+@requires time_utils
+"""
+
+import numpy as np
+import pandas as pd
+from backtesting.lib import compute_stats
+from time_utils import bar_times, utc_ns
+
+DAY_NS = 24 * 60 * 60 * 10**9
+HOUR_NS = 60 * 60 * 10**9
+
+# The epoch (1970-01-01) was a Thursday, so day number k falls on weekday (k + 3) % 7
+EPOCH_WEEKDAY = 3
+WEDNESDAY, SATURDAY, SUNDAY = 2, 5, 6
+
+
+class FxCostModel:
+    """
+    Spread, slippage, swap and lot-size costs for FX backtests.
+
+    Prices are assumed to be mid quotes, so each fill pays half the spread.
+    Slippage is charged on both fills. Swap is charged once per weekday
+    rollover the position is held over, three times on Wednesdays to cover
+    the weekend. Positive swap rates are charged and negative ones credited.
+    """
+    def __init__(self, spread_pips=0.0, session_spreads=None, slippage_pips=0.0,
+                 swap_long_pips=0.0, swap_short_pips=0.0, lot_size=None,
+                 pip_size=0.0001, rollover_hour=22):
+        """
+        @param spread_pips: float or array-like - The bid/ask spread in pips, either
+                                                  constant or one value per bar.
+        @param session_spreads: dict - Spread in pips per session, keyed by
+                                       (start_hour, end_hour) in UTC. Sessions may wrap
+                                       past midnight and override `spread_pips`.
+        @param slippage_pips: float - Slippage in pips charged on every fill.
+        @param swap_long_pips: float - Swap in pips per unit per night for long positions.
+        @param swap_short_pips: float - Swap in pips per unit per night for short positions.
+        @param lot_size: int - Position sizes are rounded down to a multiple of this
+                               many units, or left as they are if None.
+        @param pip_size: float - The price increment of one pip (0.01 for JPY pairs).
+        @param rollover_hour: int - The UTC hour of the daily rollover (17:00 New York).
+        """
+        self.spread_pips = spread_pips
+        self.session_spreads = session_spreads or {}
+        self.slippage_pips = slippage_pips
+        self.swap_long_pips = swap_long_pips
+        self.swap_short_pips = swap_short_pips
+        self.lot_size = lot_size
+        self.pip_size = pip_size
+        self.rollover_hour = rollover_hour
+
+    def spread(self, data):
+        """
+        Compute the spread of every bar in price units.
+
+        @param data: DataFrame - The OHLC data the backtest was run on.
+
+        @return: ndarray - One spread per bar.
+        """
+        spread = np.broadcast_to(np.asarray(self.spread_pips, dtype=float), (len(data),)).copy()
+        if self.session_spreads:
+            times = bar_times(data)
+            if times is None:
+                raise ValueError("Session spreads need a datetime index or a 'Datetime'/'Date' column")
+            hours = times.hour.to_numpy()
+            for (start, end), pips in self.session_spreads.items():
+                if start <= end:
+                    in_session = (hours >= start) & (hours < end)
+                else:
+                    in_session = (hours >= start) | (hours < end)
+                spread[in_session] = pips
+        return spread * self.pip_size
+
+    def rollovers(self, entry_times, exit_times):
+        """
+        Count the swap charges between each entry and exit time.
+
+        @param entry_times: DatetimeIndex - The entry time of each trade.
+        @param exit_times: DatetimeIndex - The exit time of each trade.
+
+        @return: ndarray - The number of nights charged per trade.
+        """
+        offset = self.rollover_hour * HOUR_NS
+        # Day number of the last rollover at or before each time
+        entry_day = (utc_ns(entry_times) - offset) // DAY_NS
+        exit_day = (utc_ns(exit_times) - offset) // DAY_NS
+
+        def count(weekday):
+            # Number of days k in (entry_day, exit_day] falling on the given weekday
+            residue = (weekday - EPOCH_WEEKDAY) % 7
+            return (exit_day - residue) // 7 - (entry_day - residue) // 7
+
+        return exit_day - entry_day - count(SATURDAY) - count(SUNDAY) + 2 * count(WEDNESDAY)
+
+    def apply(self, stats, data=None):
+        """
+        Apply the costs to the statistics returned by `Backtest.run()`.
+
+        Trade sizes are rounded to whole lots (trades rounded to zero are
+        dropped), the trade PnL is reduced by spread, slippage and swap, and
+        each trade's change in PnL is booked to the equity curve on its exit
+        bar. Trades still open at the end of the run pay the entry spread and
+        slippage and the swap accrued up to the last bar, booked on that bar.
+        The statistics are then recomputed from the adjusted trades and
+        equity curve.
+
+        @param stats: Series - The statistics returned by `Backtest.run()`.
+        @param data: DataFrame - The OHLC data the backtest was run on. Defaults
+                                 to the data of the strategy in `stats`.
+
+        @return: Series - The recomputed statistics, with the total cost of each
+                          kind and the per-trade costs of the closed trades in `_trades`.
+        """
+        if data is None:
+            data = stats._strategy.data.df
+        trades = stats._trades.copy()
+        open_trades = list(stats._strategy.trades)
+        if not len(trades) and not open_trades:
+            for column in ('SpreadCost', 'SlippageCost', 'Swap'):
+                trades[column] = pd.Series(dtype=float)
+            adjusted = stats.copy()
+            adjusted['_trades'] = trades
+            return _with_costs(adjusted, 0.0, 0.0, 0.0, 0.0)
+
+        # Open trades are priced as if closed at the last close, without the exit fill
+        last_bar = len(data) - 1
+        broker = stats._strategy._broker
+        open_entry_bar = data.index.get_indexer([trade.entry_time for trade in open_trades])
+        if (open_entry_bar < 0).any():
+            raise ValueError("The open trades were not entered on bars of the given data")
+        n_closed = len(trades)
+        size = np.concatenate([trades['Size'].to_numpy(dtype=float),
+                               [trade.size for trade in open_trades]]).astype(float)
+        entry_bar = np.concatenate([trades['EntryBar'].to_numpy(dtype=int), open_entry_bar])
+        exit_bar = np.concatenate([trades['ExitBar'].to_numpy(dtype=int),
+                                   np.full(len(open_trades), last_bar)])
+        entry_price = np.concatenate([trades['EntryPrice'].to_numpy(dtype=float),
+                                      [trade.entry_price for trade in open_trades]]).astype(float)
+        exit_price = np.concatenate([trades['ExitPrice'].to_numpy(dtype=float),
+                                     np.full(len(open_trades), data['Close'].iloc[-1])]).astype(float)
+        # The entry commission of an open trade has already been taken from the cash
+        commission = np.concatenate([trades['Commission'].to_numpy(dtype=float),
+                                     [broker._commission(trade.size, trade.entry_price)
+                                      for trade in open_trades]]).astype(float)
+        closed = np.arange(len(size)) < n_closed
+        pnl_before = np.where(closed, np.concatenate([trades['PnL'].to_numpy(dtype=float),
+                                                      np.zeros(len(open_trades))]),
+                              size * (exit_price - entry_price) - commission)
+
+        rounded = size
+        if self.lot_size:
+            rounded = np.trunc(size / self.lot_size) * self.lot_size
+        units = np.abs(rounded)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            commission = np.where(size != 0, commission * units / np.abs(size), 0.0)
+
+        spread = self.spread(data)
+        spread_cost = units * (spread[entry_bar] + np.where(closed, spread[exit_bar], 0.0)) / 2
+        slippage_cost = units * np.where(closed, 2, 1) * self.slippage_pips * self.pip_size
+
+        swap = np.zeros(len(size))
+        if self.swap_long_pips or self.swap_short_pips:
+            times = bar_times(data)
+            if times is None:
+                raise ValueError("Swap needs a datetime index or a 'Datetime'/'Date' column")
+            nights = self.rollovers(times[entry_bar], times[exit_bar])
+            rate = np.where(rounded > 0, self.swap_long_pips, self.swap_short_pips) * self.pip_size
+            swap = units * nights * rate
+
+        pnl = rounded * (exit_price - entry_price) - commission - spread_cost - slippage_cost - swap
+
+        # Book each trade's PnL change on its exit bar, and open trades' on the last bar
+        equity_change = np.zeros(len(data))
+        np.add.at(equity_change, exit_bar, pnl - pnl_before)
+        equity_curve = stats._equity_curve.copy()
+        equity_curve['Equity'] = equity_curve['Equity'].to_numpy() + np.cumsum(equity_change)
+
+        trades['Size'] = rounded[closed]
+        trades['Commission'] = commission[closed]
+        trades['SpreadCost'] = spread_cost[closed]
+        trades['SlippageCost'] = slippage_cost[closed]
+        trades['Swap'] = swap[closed]
+        trades['PnL'] = pnl[closed]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            trades['ReturnPct'] = pnl[closed] / (units[closed] * entry_price[closed])
+        trades = trades[units[closed] > 0]
+
+        adjusted = stats.copy()
+        adjusted['_equity_curve'] = equity_curve
+        adjusted['_trades'] = trades
+        result = compute_stats(stats=adjusted, data=data)
+        return _with_costs(result, commission.sum(), spread_cost.sum(), slippage_cost.sum(), swap.sum())
+
+
+def _with_costs(stats, commissions, spread, slippage, swap):
+    """
+    Insert the total cost of each kind into the statistics, after the equity peak.
+    """
+    costs = pd.Series({
+        'Commissions [$]': commissions,
+        'Spread [$]': spread,
+        'Slippage [$]': slippage,
+        'Swap [$]': swap,
+    }, dtype=object)
+    stats = stats.drop(costs.index, errors='ignore')
+    position = stats.index.get_loc('Equity Peak [$]') + 1
+    return type(stats)(pd.concat([stats.iloc[:position], costs, stats.iloc[position:]]), dtype=object)
@@ -1,9 +1,25 @@
-import pandas as pd
+"""
+Market Data Anomaly Detection
+
+This script loads the Parquet market data archive, normalises it, flags
+anomalous bars with a pluggable detector backend and writes a summary of the
+results to `public/anomaly_results` as JSON together with a time of day plot.
+
+@module AnomalyDetection
+@requires os
+@requires argparse
+@requires json
+@requires pandas
+@requires matplotlib
+@requires detectors
+"""
+
+import argparse
+import json
 import os
-from sklearn.ensemble import IsolationForest
-import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
-import json
+from detectors import DETECTORS, IsolationForestDetector, RollingNormalizer, make_detector
 
 # Base directory for your Parquet files
 base_dir = '../forex'
@@ -11,86 +27,199 @@ news_file_path = '../eur_usd_historical_data.csv'  # Path to your historical mar
 volume_threshold = 1.5  # Example threshold for volume spikes
 plot_output = '../../../public/anomaly_results/anomaly.png'
 json_output = '../../../public/anomaly_results/anomaly.json'
+features = ['open', 'high', 'low', 'close', 'volume']
+
+
+def load_data(base_dir, results=None):
+    """
+    Load and concatenate every Parquet file found under the base directory.
+
+    @param base_dir: str - The directory to walk for Parquet files.
+    @param results: dict - Optional results dictionary, updated with the
+                           last directory scanned.
+
+    @return: DataFrame - The concatenated data, or None if no files were found.
+    """
+    dataframes = []
+    for root, dirs, files in os.walk(base_dir):
+        if results is not None:
+            results['directories_scanned'] = root
+        for file in files:
+            if file.endswith('.parquet'):
+                dataframes.append(pd.read_parquet(os.path.join(root, file)))
+
+    if not dataframes:
+        return None
+    return pd.concat(dataframes, ignore_index=True)
 
-# Initialize a list to hold DataFrames and a dictionary to collect outputs for JSON
-dataframes = []
-results = {}
-
-# Walk through the directory and load data
-for root, dirs, files in os.walk(base_dir):
-    results['directories_scanned'] = root
-    for file in files:
-        if file.endswith('.parquet'):
-            file_path = os.path.join(root, file)
-            df = pd.read_parquet(file_path)
-            dataframes.append(df)
-
-# Concatenate all DataFrames into one (if needed)
-if dataframes:
-    full_df = pd.concat(dataframes, ignore_index=True)
-
-    # Data Preprocessing
-    features = ['open', 'high', 'low', 'close', 'volume']
-    X = full_df[features]
+
+def preprocess_data(df, features, normalization='global', window=500):
+    """
+    Fill missing values and normalise the feature columns.
+
+    @param df: DataFrame - The market data.
+    @param features: list - The feature columns to use.
+    @param normalization: str - 'global' for the full-sample mean and standard
+                                deviation, 'rolling' for a rolling window.
+    @param window: int - The rolling window length, used with 'rolling'.
+
+    @return: DataFrame - The normalised feature matrix.
+    """
+    X = df[features]
     X = X.fillna(X.mean())  # Handle missing data
-    X_normalized = (X - X.mean()) / X.std()  # Normalize data
-
-    # Calculate volume spikes
-    mean_volume = full_df['volume'].mean()
-    full_df['volume_spike'] = full_df['volume'] > (mean_volume * volume_threshold)
-
-    # Train Isolation Forest model
-    model = IsolationForest(contamination=0.01, random_state=42)
-    full_df['anomaly'] = model.fit_predict(X_normalized)
-
-    anomalies = full_df[full_df['anomaly'] == -1]
-    results['anomalies_detected'] = len(anomalies)
-    
-    anomalies.to_csv('anomalies.csv', index=False)  # Save anomalies to CSV
-    
-    # Filter anomalies with volume spikes
-    anomalies_with_volume = anomalies[anomalies['volume_spike']]
-    results['anomalies_with_volume_spikes'] = len(anomalies_with_volume)
+    if normalization == 'rolling':
+        return RollingNormalizer(window=window).update(X)
+    return (X - X.mean()) / X.std()
+
+
+def detect_anomalies(X, detector=None):
+    """
+    Label every row of the feature matrix as an anomaly (-1) or inlier (1).
+
+    @param X: DataFrame - The normalised feature matrix.
+    @param detector: AnomalyDetector - The backend to use, an Isolation
+                                       Forest by default.
+
+    @return: ndarray - One label per row.
+    """
+    if detector is None:
+        detector = IsolationForestDetector(contamination=0.01, random_state=42)
+    return detector.fit_predict(X)
+
+
+def calculate_volume_spikes(df, threshold=volume_threshold):
+    """
+    Flag bars whose volume exceeds the mean volume by the given factor.
+
+    @param df: DataFrame - The market data.
+    @param threshold: float - Multiple of the mean volume that counts as a spike.
+
+    @return: Series - A boolean flag per row.
+    """
+    return df['volume'] > (df['volume'].mean() * threshold)
 
-    # Additional Metrics
-    total_data_points = len(full_df)
+
+def analyze_anomalies(df, anomalies, features):
+    """
+    Compute and print summary metrics for the detected anomalies.
+
+    @param df: DataFrame - The full market data with a 'volume_spike' column.
+    @param anomalies: DataFrame - The rows labelled as anomalies.
+    @param features: list - The feature columns to describe.
+
+    @return: dict - The metrics, keyed as in the JSON output.
+    """
+    anomalies_with_volume = anomalies[anomalies['volume_spike']]
+    total_data_points = len(df)
     anomaly_proportion = len(anomalies) / total_data_points * 100
-    volume_spike_frequency = len(full_df[full_df['volume_spike']]) / total_data_points * 100
-    anomaly_with_spike_proportion = len(anomalies_with_volume) / len(anomalies) * 100
-
-    results['anomaly_proportion'] = anomaly_proportion
-    results['volume_spike_frequency'] = volume_spike_frequency
-    results['anomaly_volume_overlap'] = anomaly_with_spike_proportion
-    results['anomaly_descriptive_statistics'] = anomalies[features].describe().to_dict()
-
-    # Time of Day Analysis for Anomalies
-    if 'time' in anomalies.columns:
-        time_distribution = anomalies['time'].value_counts().sort_index()
-        results['time_distribution'] = time_distribution.to_dict()
-
-        # Plot Time of Day distribution
-        plt.figure(figsize=(12, 6))
-        plt.gca().set_facecolor('white')
-        time_distribution.plot(kind='line', title='Anomalies by Time of Day', color='royalblue', grid=True)
-        plt.grid(color='black', linestyle='-', linewidth=0.5)
-        plt.gca().spines['top'].set_color('black')
-        plt.gca().spines['right'].set_color('black')
-        plt.gca().spines['bottom'].set_color('black')
-        plt.gca().spines['left'].set_color('black')
-        plt.xlabel('Time of Day (24-hour format)', fontsize=12, color='black')
-        plt.ylabel('Number of Anomalies', fontsize=12, color='black')
-        plt.xticks(rotation=45, color='black')
-        plt.yticks(color='black')
-        plt.tight_layout()
-        plt.scatter(time_distribution.index, time_distribution, color='red', zorder=5)
-        plt.savefig(plot_output)  # Save the plot as a PNG file
-        plt.close()
+    volume_spike_frequency = df['volume_spike'].sum() / total_data_points * 100
+    anomaly_with_spike_proportion = len(anomalies_with_volume) / len(anomalies) * 100 if len(anomalies) else 0.0
+
+    print(f"Anomalies detected: {len(anomalies)}")
+    print(f"Anomalies with volume spikes: {len(anomalies_with_volume)}")
+    print(f"Anomaly Proportion: {anomaly_proportion:.2f}%")
+    print(f"Volume Spike Frequency: {volume_spike_frequency:.2f}%")
+    print(f"Percentage of Anomalies with Volume Spikes: {anomaly_with_spike_proportion:.2f}%")
+
+    return {
+        'anomalies_detected': len(anomalies),
+        'anomalies_with_volume_spikes': len(anomalies_with_volume),
+        'anomaly_proportion': anomaly_proportion,
+        'volume_spike_frequency': volume_spike_frequency,
+        'anomaly_volume_overlap': anomaly_with_spike_proportion,
+        'anomaly_descriptive_statistics': anomalies[features].describe().to_dict(),
+    }
+
+
+def plot_time_distribution(anomalies, output_path=None):
+    """
+    Plot the number of anomalies by time of day.
+
+    @param anomalies: DataFrame - The rows labelled as anomalies, with a 'time' column.
+    @param output_path: str - Where to save the plot as PNG. The plot is shown
+                              instead when no path is given.
+
+    @return: Series - The anomaly count per time of day.
+    """
+    time_distribution = anomalies['time'].value_counts().sort_index()
+
+    plt.figure(figsize=(12, 6))
+    plt.gca().set_facecolor('white')
+    time_distribution.plot(kind='line', title='Anomalies by Time of Day', color='royalblue', grid=True)
+    plt.grid(color='black', linestyle='-', linewidth=0.5)
+    plt.gca().spines['top'].set_color('black')
+    plt.gca().spines['right'].set_color('black')
+    plt.gca().spines['bottom'].set_color('black')
+    plt.gca().spines['left'].set_color('black')
+    plt.xlabel('Time of Day (24-hour format)', fontsize=12, color='black')
+    plt.ylabel('Number of Anomalies', fontsize=12, color='black')
+    plt.xticks(rotation=45, color='black')
+    plt.yticks(color='black')
+    plt.tight_layout()
+    plt.scatter(time_distribution.index, time_distribution, color='red', zorder=5)
+    if output_path:
+        plt.savefig(output_path)  # Save the plot as a PNG file
     else:
-        results['time_analysis'] = 'No time column available.'
+        plt.show()
+    plt.close()
+
+    return time_distribution
+
+
+def main():
+    """
+    Run the anomaly detection over the archive and write the JSON results.
+    """
+    parser = argparse.ArgumentParser(description='Detect anomalies in the market data archive.')
+    parser.add_argument('--base_dir', default=base_dir)
+    parser.add_argument('--news_file_path', default=news_file_path)
+    parser.add_argument('--volume_threshold', type=float, default=volume_threshold)
+    parser.add_argument('--detector', choices=list(DETECTORS), default=IsolationForestDetector.name)
+    parser.add_argument('--normalization', choices=['global', 'rolling'], default='global')
+    parser.add_argument('--window', type=int, default=500,
+                        help='Rolling window for normalisation and the robust_z detector.')
+    parser.add_argument('--max_fit_rows', type=int, default=None,
+                        help='Maximum rows used to fit the isolation_forest detector.')
+    parser.add_argument('--n_jobs', type=int, default=None,
+                        help='Cores used by the isolation_forest detector (-1 for all).')
+    args = parser.parse_args()
+
+    results = {}
+    full_df = load_data(args.base_dir, results)
+
+    if full_df is not None:
+        X_normalized = preprocess_data(full_df, features, args.normalization, args.window)
+        full_df['volume_spike'] = calculate_volume_spikes(full_df, args.volume_threshold)
+
+        if args.detector == IsolationForestDetector.name:
+            detector = make_detector(args.detector, contamination=0.01, random_state=42,
+                                     max_fit_rows=args.max_fit_rows, n_jobs=args.n_jobs)
+        else:
+            detector = make_detector(args.detector, window=args.window)
+        full_df['anomaly'] = detect_anomalies(X_normalized, detector)
+
+        # Throughput is reported on stdout so the JSON schema stays unchanged
+        for key, value in detector.throughput().items():
+            print(f"{key}: {value}")
+
+        anomalies = full_df[full_df['anomaly'] == -1]
+        anomalies.to_csv('anomalies.csv', index=False)  # Save anomalies to CSV
+        results.update(analyze_anomalies(full_df, anomalies, features))
+
+        # Time of Day Analysis for Anomalies
+        if 'time' in anomalies.columns:
+            time_distribution = plot_time_distribution(anomalies, plot_output)
+            results['time_distribution'] = time_distribution.to_dict()
+        else:
+            results['time_analysis'] = 'No time column available.'
+
+    else:
+        results['error'] = "No Parquet files found."
+
+    # Save results to JSON
+    with open(json_output, 'w') as json_file:
+        json.dump(results, json_file, indent=4)
 
-else:
-    results['error'] = "No Parquet files found."
 
-# Save results to JSON
-with open(json_output, 'w') as json_file:
-    json.dump(results, json_file, indent=4)
+if __name__ == '__main__':
+    main()
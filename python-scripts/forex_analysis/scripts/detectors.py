@@ -0,0 +1,293 @@
+"""
+Pluggable Anomaly Detector Backends
+
+This module provides interchangeable anomaly detectors for the market data
+anomaly analysis, together with a rolling-window normaliser that can be
+updated incrementally as new bars arrive. Every detector exposes the same
+fit/score/predict interface and records its fit and score throughput so a
+backend can be chosen per deployment.
+
+@module Detectors
+@requires abc
+@requires time
+@requires numpy
+@requires pandas
+@requires sklearn
+"""
+
+import time
+from abc import ABC, abstractmethod
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+
+# Scale factor that makes the MAD a consistent estimator of the standard deviation
+MAD_SCALE = 0.6745
+
+
+class RollingNormalizer:
+    """
+    Normalises features with a rolling mean and standard deviation.
+
+    Only the last `window - 1` raw rows are kept between calls, so new bars
+    can be normalised incrementally without touching the full history.
+    """
+    def __init__(self, window=500, min_periods=2):
+        """
+        @param window: int - Number of rows in the rolling window.
+        @param min_periods: int - Minimum rows needed before a value is normalised.
+        """
+        self.window = window
+        self.min_periods = min_periods
+        self._tail = None
+
+    def update(self, X):
+        """
+        Normalise a block of new rows, using the stored tail as history.
+
+        @param X: DataFrame - The new rows to normalise.
+
+        @return: DataFrame - The normalised rows, indexed like `X`.
+        """
+        history = X if self._tail is None else pd.concat([self._tail, X])
+        rolling = history.rolling(self.window, min_periods=self.min_periods)
+        mean = rolling.mean()
+        std = rolling.std().replace(0, np.nan)
+        normalized = ((history - mean) / std).fillna(0.0)
+        self._tail = history.iloc[-(self.window - 1):] if self.window > 1 else history.iloc[:0]
+        return normalized.iloc[len(history) - len(X):]
+
+    def reset(self):
+        """
+        Forget the stored history.
+        """
+        self._tail = None
+
+
+class AnomalyDetector(ABC):
+    """
+    Base class for anomaly detectors.
+
+    Subclasses implement `_fit`, which returns the number of rows actually
+    fitted on, `_score` and `_predict`. Scores are
+    oriented so that higher values are more anomalous, and predictions use
+    the scikit-learn convention of -1 for anomalies and 1 for inliers.
+    """
+    name = 'base'
+
+    def __init__(self):
+        self.fit_rows = 0
+        self.fit_seconds = 0.0
+        self.score_rows = 0
+        self.score_seconds = 0.0
+
+    def fit(self, X):
+        """
+        Fit the detector on the given rows.
+
+        @param X: DataFrame or ndarray - The feature matrix.
+
+        @return: AnomalyDetector - The fitted detector.
+        """
+        X = np.asarray(X, dtype=float)
+        start = time.perf_counter()
+        rows = self._fit(X)
+        self.fit_seconds += time.perf_counter() - start
+        self.fit_rows += rows
+        return self
+
+    def score(self, X):
+        """
+        Compute an anomaly score for every row.
+
+        @param X: DataFrame or ndarray - The feature matrix.
+
+        @return: ndarray - One score per row, higher is more anomalous.
+        """
+        X = np.asarray(X, dtype=float)
+        start = time.perf_counter()
+        scores = self._score(X)
+        self.score_seconds += time.perf_counter() - start
+        self.score_rows += len(X)
+        return scores
+
+    def predict(self, X):
+        """
+        Label every row as an anomaly (-1) or an inlier (1).
+
+        @param X: DataFrame or ndarray - The feature matrix.
+
+        @return: ndarray - One label per row.
+        """
+        return self._predict(self.score(X))
+
+    def fit_predict(self, X):
+        """
+        Fit the detector on the given rows and label them.
+
+        @param X: DataFrame or ndarray - The feature matrix.
+
+        @return: ndarray - One label per row.
+        """
+        return self.fit(X).predict(X)
+
+    def throughput(self):
+        """
+        Report the fit and score throughput measured so far.
+
+        @return: dict - Rows, seconds and rows per second for fit and score.
+        """
+        def rate(rows, seconds):
+            return rows / seconds if seconds > 0 else None
+
+        return {
+            'detector': self.name,
+            'fit_rows': self.fit_rows,
+            'fit_seconds': self.fit_seconds,
+            'fit_rows_per_second': rate(self.fit_rows, self.fit_seconds),
+            'score_rows': self.score_rows,
+            'score_seconds': self.score_seconds,
+            'score_rows_per_second': rate(self.score_rows, self.score_seconds),
+        }
+
+    @abstractmethod
+    def _fit(self, X):
+        pass
+
+    @abstractmethod
+    def _score(self, X):
+        pass
+
+    @abstractmethod
+    def _predict(self, scores):
+        pass
+
+
+class IsolationForestDetector(AnomalyDetector):
+    """
+    Isolation Forest with controlled subsampling and parallel fitting.
+
+    Each tree is grown on `max_samples` rows, and the forest itself can be
+    fitted on a random subset of at most `max_fit_rows` rows so that fit
+    time stays flat as the archive grows. Trees are built on `n_jobs` cores.
+    """
+    name = 'isolation_forest'
+
+    def __init__(self, contamination=0.01, n_estimators=100, max_samples='auto',
+                 max_fit_rows=None, n_jobs=None, random_state=42):
+        """
+        @param contamination: float - Expected proportion of anomalies.
+        @param n_estimators: int - Number of trees in the forest.
+        @param max_samples: int, float or 'auto' - Rows drawn to build each tree.
+        @param max_fit_rows: int - Maximum number of rows used to fit the forest.
+        @param n_jobs: int - Number of cores used for fitting and scoring (-1 for all).
+        @param random_state: int - Seed for subsampling and tree construction.
+        """
+        super().__init__()
+        self.max_fit_rows = max_fit_rows
+        self.random_state = random_state
+        self.model = IsolationForest(contamination=contamination, n_estimators=n_estimators,
+                                     max_samples=max_samples, n_jobs=n_jobs,
+                                     random_state=random_state)
+
+    def _fit(self, X):
+        if self.max_fit_rows is not None and len(X) > self.max_fit_rows:
+            rng = np.random.default_rng(self.random_state)
+            X = X[rng.choice(len(X), self.max_fit_rows, replace=False)]
+        self.model.fit(X)
+        return len(X)
+
+    def _score(self, X):
+        return -self.model.score_samples(X)
+
+    def _predict(self, scores):
+        # score_samples is offset by offset_ in decision_function, so the flipped
+        # threshold is -offset_
+        return np.where(scores > -self.model.offset_, -1, 1)
+
+
+class RollingRobustZDetector(AnomalyDetector):
+    """
+    Vectorised rolling robust z-score detector for low-latency use.
+
+    Each row is compared, per feature, against the median of the preceding
+    `window` rows. Its spread is estimated from the same window as the median
+    of each past row's absolute deviation from that row's own trailing median.
+    This rolling approximation of the median absolute deviation (MAD) can be
+    computed with two rolling medians. The score of a row is its largest
+    absolute robust z-score across features. Only the statistics of past
+    rows are used, so the detector can score live bars. `score` and
+    `predict` leave the history unchanged; `update` scores a block of new rows
+    and keeps the last `2 * window` rows so the next block is scored against them.
+    """
+    name = 'robust_z'
+
+    def __init__(self, window=500, threshold=3.5, min_periods=20):
+        """
+        @param window: int - Number of past rows used for the median and the
+                             approximate MAD.
+        @param threshold: float - Robust z-score above which a row is an anomaly.
+        @param min_periods: int - Minimum past rows needed before a row is scored.
+        """
+        super().__init__()
+        self.window = window
+        self.threshold = threshold
+        self.min_periods = min_periods
+        self._tail = None
+
+    def update(self, X):
+        """
+        Score a block of new rows and add them to the history.
+
+        @param X: DataFrame or ndarray - The feature matrix of the new rows.
+
+        @return: ndarray - One score per row, higher is more anomalous.
+        """
+        scores = self.score(X)
+        self._tail = self._history(np.asarray(X, dtype=float))[-2 * self.window:]
+        return scores
+
+    def _history(self, X):
+        return X if self._tail is None else np.vstack([self._tail, X])
+
+    def _fit(self, X):
+        # The statistics are rolling, so there is nothing to learn up front.
+        # Fitting starts a fresh history; later update calls extend it.
+        self._tail = None
+        return 0
+
+    def _score(self, X):
+        history = self._history(X)
+        frame = pd.DataFrame(history)
+        rolling = frame.rolling(self.window, min_periods=self.min_periods)
+        median = rolling.median().shift(1)
+        # The MAD of a row looks at the deviations of the previous `window` rows,
+        # each of which needs its own `window` rows of history, hence the
+        # `2 * window` rows kept by `update`
+        mad = (frame - median).abs().rolling(self.window, min_periods=self.min_periods).median().shift(1)
+        z = MAD_SCALE * (frame - median).abs() / mad.replace(0, np.nan)
+        scores = z.max(axis=1, skipna=True).fillna(0.0).to_numpy()
+        return scores[len(history) - len(X):]
+
+    def _predict(self, scores):
+        return np.where(scores > self.threshold, -1, 1)
+
+
+DETECTORS = {
+    IsolationForestDetector.name: IsolationForestDetector,
+    RollingRobustZDetector.name: RollingRobustZDetector,
+}
+
+
+def make_detector(name, **kwargs):
+    """
+    Create a detector backend by name.
+
+    @param name: str - One of the keys of DETECTORS.
+    @param kwargs: dict - Keyword arguments passed to the detector.
+
+    @return: AnomalyDetector - The detector instance.
+    """
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown detector '{name}'. Choose one of: {', '.join(DETECTORS)}")
+    return DETECTORS[name](**kwargs)
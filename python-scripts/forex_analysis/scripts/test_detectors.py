@@ -0,0 +1,69 @@
+import pytest
+import pandas as pd
+import numpy as np
+import os
+import sys
+
+# Add the directory containing your script to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import detectors
+
+@pytest.fixture
+def feature_df():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(400, 3)), columns=['open', 'close', 'volume'])
+    df.loc[300] = [8.0, -8.0, 25.0]  # One obvious outlier
+    return df
+
+def test_rolling_normalizer_incremental_matches_batch(feature_df):
+    batch = detectors.RollingNormalizer(window=50).update(feature_df)
+
+    normalizer = detectors.RollingNormalizer(window=50)
+    incremental = pd.concat([normalizer.update(feature_df.iloc[:250]),
+                             normalizer.update(feature_df.iloc[250:])])
+
+    assert np.allclose(batch, incremental)
+
+def test_isolation_forest_subsampled_fit(feature_df):
+    detector = detectors.IsolationForestDetector(contamination=0.01, max_samples=64,
+                                                 max_fit_rows=200, n_jobs=2)
+    labels = detector.fit_predict(feature_df)
+
+    assert len(labels) == len(feature_df)
+    assert set(labels).issubset({-1, 1})
+    assert labels[300] == -1
+    stats = detector.throughput()
+    assert stats['fit_rows'] == 200
+    assert stats['score_rows'] == len(feature_df)
+    assert stats['fit_rows_per_second'] > 0
+
+def test_robust_z_flags_outlier_and_scores_incrementally(feature_df):
+    detector = detectors.RollingRobustZDetector(window=100, threshold=5)
+    labels = detector.fit_predict(feature_df)
+
+    assert labels[300] == -1
+    assert (labels == -1).sum() < 10
+
+    batch = detectors.RollingRobustZDetector(window=100).fit(feature_df.iloc[:0]).score(feature_df)
+    incremental = detectors.RollingRobustZDetector(window=100).fit(feature_df.iloc[:0])
+    scores = np.concatenate([incremental.update(feature_df.iloc[:250]),
+                             incremental.update(feature_df.iloc[250:])])
+    assert np.allclose(batch, scores)
+
+def test_robust_z_score_leaves_history_unchanged(feature_df):
+    detector = detectors.RollingRobustZDetector(window=100, threshold=5).fit(feature_df.iloc[:0])
+    detector.update(feature_df.iloc[:250])
+    block = feature_df.iloc[250:]
+
+    scores = detector.score(block)
+    assert np.allclose(detector.score(block), scores)
+    assert np.array_equal(detector.predict(block), np.where(scores > 5, -1, 1))
+
+def test_make_detector_unknown_name():
+    with pytest.raises(ValueError):
+        detectors.make_detector('nope')
+
+def test_detector_base_is_abstract():
+    with pytest.raises(TypeError):
+        detectors.AnomalyDetector()
@@ -0,0 +1,276 @@
+"""
+Incremental Backtest With Checkpoints
+
+This module provides a Backtest that saves a checkpoint at the end of every
+run: the broker state (cash, open trades and pending orders), the equity
+curve, the closed trades, the indicator values and a fingerprint of the data.
+When the same data is run again with new bars appended, only the new bars
+(plus a short indicator warm-up window) are simulated and the results are
+merged with the checkpoint, so a daily refresh scales with the new bars
+rather than with the whole history. If the earlier bars, the strategy (its
+code as well as its parameters) or the backtest settings changed, the full
+history is recomputed instead.
+
+@module IncrementalBacktest
+@requires os
+@requires pickle
+@requires hashlib
+@requires inspect
+@requires marshal
+@requires numpy
+@requires pandas
+@requires backtesting
+"""
+
+import hashlib
+import inspect
+import marshal
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from backtesting import Backtest
+from backtesting.backtesting import Order, Trade
+from backtesting.lib import compute_stats
+
+CHECKPOINT_VERSION = 1
+
+
+class IncrementalBacktest(Backtest):
+    """
+    A Backtest that resumes from a checkpoint when new bars are appended.
+
+    The strategy's indicators must only look back a bounded number of bars
+    (as SMA does). The warm-up window is derived from the indicators' leading
+    NaN values and can be widened with `lookback` for indicators with longer
+    memory, such as exponential averages.
+    """
+    def __init__(self, data, strategy, *, checkpoint_path, lookback=None, **kwargs):
+        """
+        @param data: DataFrame - The OHLC data, with new bars appended to the
+                                 data of the checkpointed run.
+        @param strategy: type - The Strategy subclass to run.
+        @param checkpoint_path: str - The file the checkpoint is read from and written to.
+        @param lookback: int - Bars replayed before the checkpoint so indicators
+                               are warmed up when trading resumes.
+        @param kwargs: dict - Keyword arguments passed to Backtest.
+        """
+        if kwargs.get('finalize_trades'):
+            raise ValueError("IncrementalBacktest needs open trades at the end of a run; "
+                             "finalize_trades is not supported")
+        super().__init__(data, strategy, **kwargs)
+        self.checkpoint_path = checkpoint_path
+        self.lookback = lookback
+        self.resumed = False
+        self._kwargs = kwargs
+
+    def run(self, **kwargs):
+        """
+        Run the backtest, resuming from the checkpoint when it is still valid,
+        and save a new checkpoint.
+
+        @param kwargs: dict - Strategy parameters, as for Backtest.run().
+
+        @return: Series - The statistics for the full data.
+        """
+        checkpoint = self._load_checkpoint(kwargs)
+        self.resumed = checkpoint is not None
+        if self.resumed:
+            stats = self._resume(checkpoint, kwargs)
+        else:
+            stats = super().run(**kwargs)
+        self._results = stats
+        self._save_checkpoint(stats, kwargs)
+        return stats
+
+    def _config(self, params):
+        return (self._strategy.__module__, self._strategy.__qualname__, _strategy_hash(self._strategy),
+                repr(sorted(params.items())), repr(sorted(self._kwargs.items())))
+
+    def _fingerprint(self, n_bars):
+        return int(pd.util.hash_pandas_object(self._data.iloc[:n_bars]).sum())
+
+    def _load_checkpoint(self, params):
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        try:
+            with open(self.checkpoint_path, 'rb') as f:
+                checkpoint = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+
+        n_bars = checkpoint.get('n_bars', 0)
+        if (checkpoint.get('version') != CHECKPOINT_VERSION or
+                checkpoint.get('config') != self._config(params) or
+                not 0 < n_bars <= len(self._data) or
+                checkpoint.get('fingerprint') != self._fingerprint(n_bars) or
+                not checkpoint.get('traded')):
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self, stats, params):
+        strategy = stats._strategy
+        broker = strategy._broker
+        offset = getattr(strategy, '_resume_offset', 0)
+        n_bars = len(self._data)
+        warmup = max((int(np.isnan(np.atleast_2d(indicator).astype(float)).argmin(axis=-1).max())
+                      for indicator in strategy._indicators), default=0)
+
+        trades = list(broker.trades)
+        checkpoint = {
+            'version': CHECKPOINT_VERSION,
+            'config': self._config(params),
+            'n_bars': n_bars,
+            'fingerprint': self._fingerprint(n_bars),
+            # A fresh run only reaches the last bar if it got past the warm-up
+            'traded': self.resumed or n_bars > warmup + 1,
+            'lookback': self.lookback if self.lookback is not None else warmup + 2,
+            'cash': broker._cash,
+            'trades': [{
+                'size': trade.size,
+                'entry_price': trade.entry_price,
+                'entry_bar': trade.entry_bar + offset,
+                'tag': trade.tag,
+                'sl': trade.sl,
+                'tp': trade.tp,
+                'commissions': trade._commissions,
+            } for trade in trades],
+            'orders': [{
+                'size': order.size,
+                'limit': order.limit,
+                'stop': order.stop,
+                'sl': order.sl,
+                'tp': order.tp,
+                'tag': order.tag,
+                'parent_trade': trades.index(order.parent_trade) if order.parent_trade in trades else None,
+            } for order in broker.orders if not order.is_contingent],
+            'equity': stats._equity_curve['Equity'].to_numpy(),
+            'closed_trades': stats._trades,
+            'indicators': [np.asarray(indicator) for indicator in strategy._indicators],
+        }
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint_path)), exist_ok=True)
+        # Replace the checkpoint atomically, as runs sharing it may overlap
+        temp_path = f'{self.checkpoint_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def _resume(self, checkpoint, params):
+        n_bars = checkpoint['n_bars']
+        # Replay enough bars to warm the indicators up, and to cover the
+        # entry bar of every open trade so its entry time can be looked up
+        offset = max(0, min([n_bars - 1 - checkpoint['lookback']] +
+                            [trade['entry_bar'] for trade in checkpoint['trades']]))
+
+        window = Backtest(self._data.iloc[offset:], _resumed_strategy(self._strategy, checkpoint, offset),
+                          **self._kwargs)
+        window_stats = window.run(**params)
+        strategy = window_stats._strategy
+        strategy._resume_offset = offset
+
+        # Indicators: checkpointed values up to the last checkpointed bar, new values after
+        full_indicators = []
+        for old, indicator in zip(checkpoint['indicators'], strategy._indicators):
+            values = np.concatenate([old[..., :n_bars], np.asarray(indicator)[..., n_bars - offset:]], axis=-1)
+            full_indicators.append(type(indicator)(values, name=indicator.name,
+                                                   **{**indicator._opts, 'index': self._data.index}))
+        for attr, value in list(vars(strategy).items()):
+            for indicator, full in zip(strategy._indicators, full_indicators):
+                if isinstance(value, type(indicator)) and np.shares_memory(value, indicator):
+                    setattr(strategy, attr, full)
+        strategy._indicators = full_indicators
+
+        # Trades closed after the checkpoint, in full-data bar numbers
+        new_trades = window_stats._trades.copy()
+        new_trades['EntryBar'] += offset
+        new_trades['ExitBar'] += offset
+        trades = checkpoint['closed_trades']
+        if len(new_trades):
+            trades = pd.concat([trades, new_trades], ignore_index=True)
+        for indicator in full_indicators:
+            values = np.atleast_2d(indicator)
+            for i, row in enumerate(values):
+                suffix = f'_{i}' if len(values) > 1 else ''
+                trades[f'Entry_{indicator.name}{suffix}'] = row[trades['EntryBar'].to_numpy(dtype=int)]
+                trades[f'Exit_{indicator.name}{suffix}'] = row[trades['ExitBar'].to_numpy(dtype=int)]
+
+        equity = np.concatenate([checkpoint['equity'],
+                                 window_stats._equity_curve['Equity'].to_numpy()[n_bars - offset:]])
+        merged = window_stats.copy()
+        merged['_strategy'] = strategy
+        merged['_trades'] = trades
+        merged['_equity_curve'] = pd.DataFrame({'Equity': equity}, index=self._data.index)
+        stats = compute_stats(stats=merged, data=self._data)
+
+        # compute_stats leaves out commissions when given a trades DataFrame
+        commissions = trades['Commission'].sum()
+        if commissions:
+            position = stats.index.get_loc('Equity Peak [$]') + 1
+            stats = type(stats)(pd.concat([stats.iloc[:position],
+                                           pd.Series({'Commissions [$]': commissions}, dtype=object),
+                                           stats.iloc[position:]]), dtype=object)
+        return stats
+
+
+def _strategy_hash(strategy):
+    """
+    Hash the code of a strategy class and its bases, so that editing the
+    strategy invalidates checkpoints even if its name stays the same.
+    """
+    digest = hashlib.sha256()
+    for cls in strategy.__mro__:
+        if cls is object or cls.__module__.split('.')[0] == 'backtesting':
+            continue
+        try:
+            digest.update(inspect.getsource(cls).encode())
+        except (OSError, TypeError):
+            # No source file (e.g. defined in an interactive session): use the bytecode
+            for name, value in sorted(vars(cls).items()):
+                code = getattr(value, '__code__', None)
+                if code is not None:
+                    digest.update(name.encode() + marshal.dumps(code))
+    return digest.hexdigest()
+
+
+def _resumed_strategy(strategy, checkpoint, offset):
+    """
+    Wrap a strategy so that it replays the warm-up bars without trading,
+    restores the checkpointed broker state on the last checkpointed bar and
+    trades normally from the first new bar.
+    """
+    last_bar = checkpoint['n_bars'] - 1
+
+    class Resumed(strategy):
+        def next(self):
+            bar = offset + len(self.data) - 1
+            if bar < last_bar:
+                return
+            if bar == last_bar:
+                _restore_broker(self._broker, checkpoint, offset)
+                return
+            super().next()
+
+    Resumed.__name__ = strategy.__name__
+    Resumed.__qualname__ = strategy.__qualname__
+    return Resumed
+
+
+def _restore_broker(broker, checkpoint, offset):
+    broker._cash = checkpoint['cash']
+    trades = []
+    for saved in checkpoint['trades']:
+        trade = Trade(broker, saved['size'], saved['entry_price'], saved['entry_bar'] - offset, saved['tag'])
+        trade._commissions = saved['commissions']
+        broker.trades.append(trade)
+        trades.append(trade)
+        if saved['sl'] is not None:
+            trade.sl = saved['sl']
+        if saved['tp'] is not None:
+            trade.tp = saved['tp']
+    for saved in checkpoint['orders']:
+        parent = trades[saved['parent_trade']] if saved['parent_trade'] is not None else None
+        broker.orders.append(Order(broker, saved['size'], saved['limit'], saved['stop'],
+                                   saved['sl'], saved['tp'], parent, saved['tag']))
+    # Position size and value are cached from before the trades were restored
+    broker._trades_cache_clear()
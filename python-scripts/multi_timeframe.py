@@ -0,0 +1,119 @@
+"""
+Multi-Timeframe Indicators
+
+This module lets a strategy running on a base timeframe (e.g. 5m bars) use
+indicators computed on higher timeframes (e.g. 1h or 1d). The base data is
+resampled once, the indicator is computed once on the resampled bars, and
+its values are mapped back onto the base bars through a precomputed index
+array. A higher-timeframe bar only becomes visible on the base bar at whose
+close it is complete, so there is no lookahead. Strategies read the aligned
+values as plain arrays, at the same speed as base-timeframe indicators.
+
+@module MultiTimeframe
+@requires numpy
+@requires pandas
+@requires time_utils
+"""
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+from time_utils import bar_times
+
+OHLCV_AGG = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+
+class TimeframeAlignment:
+    """
+    Maps base bars onto the last completed bar of a higher timeframe.
+    """
+    def __init__(self, times, rule, base_period=None):
+        """
+        @param times: DatetimeIndex - The open time of every base bar.
+        @param rule: str - The pandas offset of the higher timeframe (e.g. '1h', '1D').
+        @param base_period: Timedelta - The length of a base bar. Inferred from the
+                                        most common spacing of `times` if not given.
+        """
+        self.times = pd.DatetimeIndex(times)
+        self.rule = rule
+        if base_period is None:
+            base_period = pd.Series(self.times).diff().mode().iloc[0] if len(self.times) > 1 else pd.Timedelta(0)
+        self.base_period = pd.Timedelta(base_period)
+
+        # Higher timeframe bars that contain at least one base bar, by open time
+        groups = pd.Series(np.arange(len(self.times)), index=self.times)
+        groups = groups.resample(rule, label='left', closed='left').count()
+        self.higher_times = groups.index[groups.to_numpy() > 0]
+        higher_close = (self.higher_times + to_offset(rule)).as_unit('ns').asi8
+        base_close = (self.times + self.base_period).as_unit('ns').asi8
+
+        # Position of the last higher timeframe bar closed by each base bar's close,
+        # -1 before the first one completes
+        self.index = np.searchsorted(higher_close, base_close, side='right') - 1
+
+    def resample(self, df, agg=None):
+        """
+        Resample base OHLCV data to the higher timeframe.
+
+        @param df: DataFrame - The base data, one row per entry of `times`.
+        @param agg: dict - Aggregation per column, OHLCV rules by default.
+
+        @return: DataFrame - One row per higher timeframe bar, indexed by open time.
+        """
+        if agg is None:
+            agg = {column: how for column, how in OHLCV_AGG.items() if column in df.columns}
+        frame = df[list(agg)].set_axis(self.times)
+        resampled = frame.resample(self.rule, label='left', closed='left').agg(agg)
+        return resampled.loc[self.higher_times]
+
+    def align(self, values):
+        """
+        Map higher timeframe values onto the base bars.
+
+        @param values: array-like - One value per higher timeframe bar, a DataFrame
+                                    with one row per bar, or a 2D array with the
+                                    bars on the last axis.
+
+        @return: ndarray - One value per base bar, NaN before the first
+                           higher timeframe bar has closed.
+        """
+        if isinstance(values, pd.DataFrame):
+            values = values.T
+        values = np.asarray(values, dtype=float)
+        aligned = values[..., np.maximum(self.index, 0)]
+        aligned[..., self.index < 0] = np.nan
+        return aligned
+
+
+def resample_indicator(strategy, rule, func, *args, column='Close', name=None, **kwargs):
+    """
+    Compute an indicator on a higher timeframe and register it, aligned to
+    the base bars, as a strategy indicator. Call it from `Strategy.init`.
+
+        >>> self.trend = resample_indicator(self, '1h', SMA, 50)
+
+    @param strategy: Strategy - The strategy being initialised.
+    @param rule: str - The pandas offset of the higher timeframe (e.g. '1h', '1D').
+    @param func: callable - The indicator function, called with the resampled column.
+    @param args: tuple - Extra positional arguments for `func`.
+    @param column: str - The resampled column passed to `func`, or None to pass
+                         the whole resampled OHLCV DataFrame.
+    @param name: str - The indicator name shown in plots.
+    @param kwargs: dict - Extra keyword arguments for `func`.
+
+    @return: ndarray - The aligned indicator, as returned by `Strategy.I`.
+    """
+    df = strategy.data.df
+    times = bar_times(df)
+    if times is None:
+        raise ValueError("Multi-timeframe indicators need a datetime index or a 'Datetime'/'Date' column")
+
+    alignment = TimeframeAlignment(times, rule)
+    resampled = alignment.resample(df)
+    values = func(resampled if column is None else resampled[column], *args, **kwargs)
+    aligned = alignment.align(values)
+
+    if name is None:
+        params = ','.join(str(arg) for arg in args)
+        name = f'{rule} {getattr(func, "__name__", "indicator")}({params})'
+    return strategy.I(lambda: aligned, name=name)
@@ -0,0 +1,100 @@
+"""
+Import and Backtest Pipeline
+
+This script fetches historical data and backtests it in a single process:
+the fetched DataFrame is handed to the backtester's `run_backtest` directly
+instead of being written to data.csv and parsed again by a second process.
+The CSV is still written, as an archival side output, in a background thread
+while the backtest runs.
+
+@module Pipeline
+@requires sys
+@requires os
+@requires threading
+@requires importlib
+@requires inspect
+@requires pandas
+@requires Import_data
+"""
+
+import importlib.util
+import inspect
+import os
+import sys
+import threading
+import pandas as pd
+from Import_data import fetch_data, save_to_csv
+
+def as_csv_frame(df):
+    """
+    Give a fetched DataFrame the layout `pd.read_csv` produces for data.csv,
+    so backtesters see the same columns in both modes.
+
+    @param df: DataFrame - The data returned by fetch_data.
+
+    @return: DataFrame - The data with the date index as a column and one level of column names.
+    """
+    if isinstance(df.columns, pd.MultiIndex):
+        # yfinance adds a ticker level to the columns
+        df = df.droplevel(list(range(1, df.columns.nlevels)), axis=1)
+    return df.reset_index()
+
+def load_backtester(backtester):
+    """
+    Import a backtest script as a module.
+
+    @param backtester: str - The backtest script name, relative to python-scripts.
+
+    @return: module - The imported script.
+    """
+    script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), backtester)
+    name = os.path.splitext(os.path.basename(script_path))[0]
+    spec = importlib.util.spec_from_file_location(name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def run_pipeline(asset, from_date, to_date, interval, backtester, folder_path, checkpoint_path=None):
+    """
+    Fetch the data and backtest it in-process, archiving the CSV in the background.
+
+    @param asset: str - The asset ticker symbol (e.g., 'EURUSD=X').
+    @param from_date: str - The start date for the data in 'YYYY-MM-DD' format.
+    @param to_date: str - The end date for the data in 'YYYY-MM-DD' format.
+    @param interval: str - The frequency of data (e.g., '1d', '1h').
+    @param backtester: str - The backtest script name, relative to python-scripts.
+    @param folder_path: str - The folder the data and results are written to.
+    @param checkpoint_path: str - The checkpoint the backtester resumes from, for
+                                  backtesters that take one.
+    """
+    data = fetch_data(asset, from_date, to_date, interval)
+    if data.empty:
+        raise ValueError(f"No data returned for {asset} from {from_date} to {to_date} with interval {interval}")
+
+    os.makedirs(folder_path, exist_ok=True)
+    archive = threading.Thread(target=save_to_csv, args=(data, folder_path))
+    archive.start()
+
+    module = load_backtester(backtester)
+    parameters = inspect.signature(module.run_backtest).parameters
+    kwargs = {}
+    if checkpoint_path is not None and 'checkpointPath' in parameters:
+        kwargs['checkpointPath'] = checkpoint_path
+    print(f"Running backtester: {backtester} in-process...", flush=True)
+    try:
+        if 'data' in parameters:
+            module.run_backtest(folder_path, data=as_csv_frame(data), **kwargs)
+        else:
+            # Backtesters that only read data.csv need the archive first
+            archive.join()
+            module.run_backtest(folder_path, **kwargs)
+    finally:
+        archive.join()
+    print(f"Backtester executed successfully with folder path: {folder_path}", flush=True)
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (7, 8):
+        print("Usage: python pipeline.py EURUSD=X 2023-01-01 2023-06-30 1d Backtester.py path/to/folder [checkpoint_file]", flush=True)
+        sys.exit(1)
+
+    run_pipeline(*sys.argv[1:8])
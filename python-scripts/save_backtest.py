@@ -10,23 +10,28 @@ statistical data and a plot, to a specified folder.
 
 import os
 
-def save_backtest(backtest, folder_path):
+def save_backtest(backtest, folder_path, cost_model=None):
     """
     Save the results of a backtest to a specified folder.
 
-    This function runs the backtest, creates a results folder if it doesn't 
-    exist, and saves the backtest statistics in JSON format and the plot as 
-    an HTML file.
+    This function runs the backtest, applies the cost model if one is given,
+    creates a results folder if it doesn't exist, and saves the backtest
+    statistics in JSON format and the plot as an HTML file.
 
     @param backtest: Backtest - An instance of the Backtest class containing 
                       the strategy and data for the backtest.
     @param folder_path: str - The path of the folder where the results will be 
                             saved.
+    @param cost_model: FxCostModel - Optional spread, slippage, swap and lot-size
+                                     costs applied to the results.
 
     @return: None
     """
     # Run the backtest
     stats = backtest.run()
+    if cost_model is not None:
+        # The strategy of a resumed IncrementalBacktest only holds the replayed bars
+        stats = cost_model.apply(stats, data=backtest._data)
 
     # Create the results folder if it doesn't exist
     results_folder = os.path.join(folder_path, "results")
@@ -36,4 +41,4 @@ def save_backtest(backtest, folder_path):
     stats.to_json(os.path.join(results_folder, "backtest_results.json"))
 
     # Save the backtest plot as an HTML file
-    backtest.plot(filename=os.path.join(results_folder, "plot.html"), open_browser=False)
\ No newline at end of file
+    backtest.plot(results=stats, filename=os.path.join(results_folder, "plot.html"), open_browser=False)
\ No newline at end of file
@@ -0,0 +1,498 @@
+"""
+Backtest Job Scheduler
+
+This module runs import and backtest jobs as child processes through a
+priority queue. It limits how many jobs run at once and how much memory they
+may reserve together, collapses identical pending requests into a single job,
+lets a running job be cancelled, and drops the logs of finished jobs once
+their retention period has passed.
+
+A job's memory reservation is a limit on resident memory (RSS). On Linux a
+monitor thread polls the RSS of each running job's process and kills a job
+that exceeds its reservation, so a runaway backtest fails instead of starving
+the other jobs. Processes started by the job's own process are not counted.
+Elsewhere the reservation is only used to decide when a job may start.
+
+Run as a script, the scheduler is a long-lived service driven over stdin and
+stdout with one JSON object per line, which is how server.js submits, cancels
+and follows backtest runs. Requests carry an `id` and an `op`:
+
+    {"id": 1, "op": "submit", "commands": [[...]], "key": [...], "priority": 0, "memory_mb": 1024, "env": {...}}
+    {"id": 2, "op": "cancel", "job": "<job id>"}
+    {"id": 3, "op": "status", "job": "<job id>"}
+    {"id": 4, "op": "logs", "job": "<job id>"}
+
+and are answered with {"id": ..., "result": ...} or {"id": ..., "error": ...}.
+Job output and completion are pushed as {"event": "output", "job": ..., "line": ...}
+and {"event": "finished", "job": {...}}.
+
+@module Scheduler
+@requires argparse
+@requires json
+@requires os
+@requires sys
+@requires time
+@requires heapq
+@requires itertools
+@requires threading
+@requires subprocess
+@requires uuid
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+PENDING = 'pending'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Job:
+    """
+    A queued unit of work: one or more commands run one after the other.
+    """
+    def __init__(self, commands, priority, key, memory_mb, env=None):
+        """
+        @param commands: list - The argument lists of the commands to run in order.
+        @param priority: int - Lower values run first.
+        @param key: tuple - The identity used to collapse identical requests.
+        @param memory_mb: int - The resident memory reserved for the job while it runs.
+        @param env: dict - Environment variables set for the commands, on top of
+                           the scheduler's own environment.
+        """
+        self.id = str(uuid.uuid4())
+        self.commands = commands
+        self.priority = priority
+        self.key = key
+        self.memory_mb = memory_mb
+        self.env = env or {}
+        self.state = PENDING
+        self.returncode = None
+        self.log = []
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.process = None
+        self.cancel_requested = False
+        self.memory_exceeded = False
+
+    def to_dict(self):
+        """
+        @return: dict - A JSON serialisable summary of the job.
+        """
+        return {
+            'id': self.id,
+            'state': self.state,
+            'priority': self.priority,
+            'returncode': self.returncode,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobScheduler:
+    """
+    Runs jobs from a priority queue with bounded concurrency and memory.
+    """
+    def __init__(self, max_concurrent=2, max_memory_mb=None, retention_seconds=3600,
+                 kill_timeout=5, memory_poll_seconds=0.5, on_output=None, on_finish=None):
+        """
+        @param max_concurrent: int - Maximum number of jobs running at once.
+        @param max_memory_mb: int - Maximum memory reserved by running jobs
+                                    together, or None for no limit. When set,
+                                    every job must reserve some memory.
+        @param retention_seconds: float - How long finished jobs and their logs are kept.
+        @param kill_timeout: float - Seconds to wait after terminating a cancelled
+                                     job before killing it.
+        @param memory_poll_seconds: float - How often the resident memory of running
+                                            jobs is checked against their reservation.
+        @param on_output: callable - Called with the job id and each line the job outputs.
+        @param on_finish: callable - Called with the job summary when a job finishes.
+        """
+        self.max_concurrent = max_concurrent
+        self.max_memory_mb = max_memory_mb
+        self.retention_seconds = retention_seconds
+        self.kill_timeout = kill_timeout
+        self.memory_poll_seconds = memory_poll_seconds
+        self.on_output = on_output
+        self.on_finish = on_finish
+        self.jobs = {}
+        self._queue = []
+        self._pending_keys = {}
+        self._counter = itertools.count()
+        self._running = 0
+        self._reserved_mb = 0
+        self._lock = threading.Condition()
+        self._closed = False
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+        self._monitor = threading.Thread(target=self._watch_memory, daemon=True)
+        self._monitor.start()
+
+    def submit(self, commands, priority=0, memory_mb=0, key=None, env=None):
+        """
+        Queue a job, or return the pending job already queued for the same request.
+
+        @param commands: list - The argument lists of the commands to run in order.
+        @param priority: int - Lower values run first.
+        @param memory_mb: int - The resident memory reserved for the job while it runs,
+                                and the most its process may use. 0 for no limit,
+                                which is only allowed without `max_memory_mb`.
+        @param key: hashable - Identity of the request. Defaults to the commands and env;
+                               pass e.g. (asset, from_date, to_date, interval, backtester)
+                               when the commands embed a per-run output folder.
+        @param env: dict - Environment variables set for the commands, on top of
+                           the scheduler's own environment.
+
+        @return: str - The id of the job handling the request.
+        """
+        if key is None:
+            key = (tuple(tuple(command) for command in commands), tuple(sorted((env or {}).items())))
+        if self.max_memory_mb is not None:
+            if memory_mb <= 0:
+                raise ValueError("Jobs must reserve memory when the scheduler has a memory limit")
+            if memory_mb > self.max_memory_mb:
+                raise ValueError(f"Job needs {memory_mb} MB but the scheduler limit is {self.max_memory_mb} MB")
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Scheduler has been shut down")
+            self._cleanup()
+            existing = self._pending_keys.get(key)
+            if existing is not None:
+                # A higher priority duplicate promotes the pending job
+                if priority < existing.priority:
+                    existing.priority = priority
+                    heapq.heappush(self._queue, (priority, next(self._counter), existing))
+                return existing.id
+
+            job = Job(commands, priority, key, memory_mb, env)
+            self.jobs[job.id] = job
+            self._pending_keys[key] = job
+            heapq.heappush(self._queue, (priority, next(self._counter), job))
+            self._lock.notify_all()
+            return job.id
+
+    def cancel(self, job_id):
+        """
+        Cancel a pending or running job. A running job is terminated, then
+        killed if it has not exited after `kill_timeout` seconds.
+
+        @param job_id: str - The id of the job.
+
+        @return: bool - True if the job was cancelled, False if it had already finished.
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return False
+            job.cancel_requested = True
+            summary = None
+            if job.state == PENDING:
+                self._pending_keys.pop(job.key, None)
+                summary = self._finish(job, CANCELLED)
+            process = job.process
+        if summary is not None:
+            self._notify_finish(summary)
+            return True
+
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(self.kill_timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        return True
+
+    def status(self, job_id):
+        """
+        @param job_id: str - The id of the job.
+
+        @return: dict - The job summary, or None if the job is unknown or expired.
+        """
+        with self._lock:
+            self._cleanup()
+            job = self.jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def logs(self, job_id):
+        """
+        @param job_id: str - The id of the job.
+
+        @return: list - The output lines logged so far, or None if the job is unknown or expired.
+        """
+        with self._lock:
+            self._cleanup()
+            job = self.jobs.get(job_id)
+            return list(job.log) if job else None
+
+    def wait(self, job_id, timeout=None):
+        """
+        Block until the job has finished.
+
+        @param job_id: str - The id of the job.
+        @param timeout: float - Maximum seconds to wait.
+
+        @return: str - The final state of the job, or its current state on timeout.
+        """
+        with self._lock:
+            job = self.jobs[job_id]
+            self._lock.wait_for(lambda: job.state in FINISHED_STATES, timeout)
+            return job.state
+
+    def shutdown(self, cancel_running=True):
+        """
+        Stop accepting jobs, cancel pending ones and optionally running ones.
+
+        @param cancel_running: bool - Whether running jobs are cancelled too.
+        """
+        with self._lock:
+            self._closed = True
+            job_ids = [job.id for job in self.jobs.values()
+                       if job.state == PENDING or (cancel_running and job.state == RUNNING)]
+            self._lock.notify_all()
+        for job_id in job_ids:
+            self.cancel(job_id)
+        self._dispatcher.join()
+        self._monitor.join()
+
+    def _can_start(self, job):
+        if self._running >= self.max_concurrent:
+            return False
+        return self.max_memory_mb is None or self._reserved_mb + job.memory_mb <= self.max_memory_mb
+
+    def _next_job(self):
+        # Drop cancelled and superseded heap entries before looking at the head
+        while self._queue:
+            priority, _, job = self._queue[0]
+            if job.state == PENDING and priority == job.priority:
+                return job
+            heapq.heappop(self._queue)
+        return None
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                job = self._next_job()
+                while not self._closed and (job is None or not self._can_start(job)):
+                    self._lock.wait()
+                    job = self._next_job()
+                if self._closed:
+                    return
+                heapq.heappop(self._queue)
+                self._pending_keys.pop(job.key, None)
+                job.state = RUNNING
+                job.started_at = time.time()
+                self._running += 1
+                self._reserved_mb += job.memory_mb
+            threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job):
+        returncode = 0
+        for command in job.commands:
+            with self._lock:
+                if job.cancel_requested:
+                    break
+            try:
+                process = subprocess.Popen(command, stdout=subprocess.PIPE,
+                                           stderr=subprocess.STDOUT, text=True, bufsize=1,
+                                           env={**os.environ, **job.env} if job.env else None)
+            except OSError as e:
+                self._log(job, f"error: {e}")
+                returncode = -1
+                break
+            with self._lock:
+                job.process = process
+                cancelled = job.cancel_requested
+            if cancelled:
+                # Cancelled while the process was being started
+                process.terminate()
+            for line in process.stdout:
+                self._log(job, line.rstrip('\n'))
+            returncode = process.wait()
+            if returncode != 0:
+                break
+
+        with self._lock:
+            job.process = None
+            job.returncode = returncode
+            self._running -= 1
+            self._reserved_mb -= job.memory_mb
+            if job.cancel_requested:
+                summary = self._finish(job, CANCELLED)
+            else:
+                summary = self._finish(job, SUCCEEDED if returncode == 0 else FAILED)
+        self._notify_finish(summary)
+
+    def _watch_memory(self):
+        while True:
+            with self._lock:
+                self._lock.wait_for(lambda: self._closed, self.memory_poll_seconds)
+                if self._closed:
+                    return
+                running = [(job, job.process) for job in self.jobs.values()
+                           if job.state == RUNNING and job.process is not None and job.memory_mb > 0]
+
+            for job, process in running:
+                resident_mb = _resident_mb(process.pid)
+                if resident_mb is None or resident_mb <= job.memory_mb:
+                    continue
+                with self._lock:
+                    if job.process is not process or job.memory_exceeded:
+                        continue
+                    job.memory_exceeded = True
+                process.kill()
+                self._log(job, f"error: Job used {resident_mb:.0f} MB, more than its "
+                               f"{job.memory_mb} MB reservation, and was stopped")
+
+    def _log(self, job, line):
+        with self._lock:
+            job.log.append(line)
+        self._notify_output(job, line)
+
+    def _finish(self, job, state):
+        job.state = state
+        job.finished_at = time.time()
+        self._lock.notify_all()
+        return job.to_dict()
+
+    # The callbacks run outside the lock, so they may call back into the scheduler
+    def _notify_output(self, job, line):
+        if self.on_output is not None:
+            self.on_output(job.id, line)
+
+    def _notify_finish(self, summary):
+        if self.on_finish is not None:
+            self.on_finish(summary)
+
+    def _cleanup(self):
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.state in FINISHED_STATES and job.finished_at < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+
+def _resident_mb(pid):
+    """
+    Read the resident memory of a process from /proc.
+
+    @param pid: int - The process id.
+
+    @return: float - The resident memory in MB, or None if it cannot be read.
+    """
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def backtest_commands(asset, from_date, to_date, interval, backtester, folder_path,
+                      python=sys.executable):
+    """
+    Build the import and backtest commands that make up one backtest run.
+
+    @param asset: str - The asset ticker symbol (e.g., 'EURUSD=X').
+    @param from_date: str - The start date in 'YYYY-MM-DD' format.
+    @param to_date: str - The end date in 'YYYY-MM-DD' format.
+    @param interval: str - The frequency of data (e.g., '1d', '1h').
+    @param backtester: str - The backtest script name, relative to python-scripts.
+    @param folder_path: str - The folder the data and results are written to.
+    @param python: str - The Python interpreter used to run the scripts.
+
+    @return: list - The argument lists of the commands, in order.
+    """
+    import_data = os.path.join(SCRIPTS_DIR, 'Import_data.py')
+    script = os.path.join(SCRIPTS_DIR, backtester)
+    return [
+        [python, import_data, asset, from_date, to_date, interval, backtester, folder_path],
+        [python, script, folder_path],
+    ]
+
+
+def serve(scheduler_kwargs, stdin=sys.stdin, stdout=sys.stdout):
+    """
+    Run a scheduler driven by JSON lines on stdin until stdin is closed,
+    then cancel the remaining jobs.
+
+    @param scheduler_kwargs: dict - Keyword arguments for JobScheduler.
+    @param stdin: file - The stream requests are read from.
+    @param stdout: file - The stream responses and events are written to.
+    """
+    # Re-entrant so a request can hold it while answering, keeping the events
+    # of a newly submitted job behind the response that announces its id
+    write_lock = threading.RLock()
+
+    def send(message):
+        with write_lock:
+            stdout.write(json.dumps(message) + '\n')
+            stdout.flush()
+
+    scheduler = JobScheduler(**scheduler_kwargs,
+                             on_output=lambda job_id, line: send({'event': 'output', 'job': job_id, 'line': line}),
+                             on_finish=lambda job: send({'event': 'finished', 'job': job}))
+    operations = {
+        'submit': lambda request: scheduler.submit(
+            request['commands'], priority=request.get('priority', 0),
+            memory_mb=request.get('memory_mb', 0),
+            key=_hashable(request['key']) if request.get('key') is not None else None,
+            env=request.get('env')),
+        'cancel': lambda request: scheduler.cancel(request['job']),
+        'status': lambda request: scheduler.status(request['job']),
+        'logs': lambda request: scheduler.logs(request['job']),
+    }
+
+    try:
+        for line in stdin:
+            if not line.strip():
+                continue
+            request = {}
+            with write_lock:
+                try:
+                    request = json.loads(line)
+                    response = {'id': request.get('id'), 'result': operations[request['op']](request)}
+                except (ValueError, KeyError, TypeError, AttributeError, RuntimeError) as e:
+                    response = {'id': request.get('id') if isinstance(request, dict) else None,
+                                'error': f"{type(e).__name__}: {e}"}
+                send(response)
+    finally:
+        scheduler.shutdown()
+
+
+def _hashable(value):
+    # JSON arrays arrive as lists, which cannot be dictionary keys
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run backtest jobs submitted as JSON lines on stdin.')
+    parser.add_argument('--max_concurrent', type=int, default=2,
+                        help='Maximum number of jobs running at once')
+    parser.add_argument('--max_memory_mb', type=int, default=None,
+                        help='Maximum memory reserved by running jobs together')
+    parser.add_argument('--retention_seconds', type=float, default=3600,
+                        help='How long finished jobs and their logs are kept')
+    args = parser.parse_args()
+
+    serve({'max_concurrent': args.max_concurrent, 'max_memory_mb': args.max_memory_mb,
+           'retention_seconds': args.retention_seconds})
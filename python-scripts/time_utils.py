@@ -0,0 +1,44 @@
+"""
+Bar Time Utilities
+
+This module provides helpers for reading the timestamps of OHLC bars, shared
+by the modules that need bar times whether the data has a datetime index (as
+passed to a Backtest) or the 'Datetime'/'Date' column written to data.csv.
+
+@module TimeUtils
+@requires numpy
+@requires pandas
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def bar_times(data):
+    """
+    Get the UTC timestamp of every bar.
+
+    @param data: DataFrame - OHLC data with a datetime index, or with the
+                             'Datetime' or 'Date' column written by Import_data.py.
+
+    @return: DatetimeIndex - The bar times in UTC, or None if the data has no times.
+    """
+    if isinstance(data.index, pd.DatetimeIndex):
+        times = data.index
+    else:
+        column = next((c for c in ('Datetime', 'Date') if c in data.columns), None)
+        if column is None:
+            return None
+        times = pd.DatetimeIndex(pd.to_datetime(data[column], utc=True))
+    return times.tz_localize('UTC') if times.tz is None else times.tz_convert('UTC')
+
+
+def utc_ns(times):
+    """
+    Convert times to integer nanoseconds for vectorised arithmetic.
+
+    @param times: DatetimeIndex - Timezone-aware times.
+
+    @return: ndarray - The times as int64 nanoseconds since the epoch.
+    """
+    return np.asarray(times.as_unit('ns').asi8, dtype=np.int64)
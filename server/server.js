@@ -11,6 +11,7 @@
  * @requires path
  * @requires cors
  * @requires child_process
+ * @requires readline
  */
 
 const express = require('express');
@@ -19,13 +20,113 @@ const path = require('path');
 const cors = require('cors');
 const app = express();
 const { spawn } = require('child_process');
+const readline = require('readline');
 const PORT = process.env.PORT || 5000;
-const { v4: uuidv4 } = require('uuid');
+
+// Limits for the backtest job scheduler. Memory is resident memory: a backtest of
+// 100k bars peaks at about 270 MB, so each job reserves a few times that
+const MAX_CONCURRENT_JOBS = parseInt(process.env.MAX_CONCURRENT_JOBS || '2', 10);
+const MAX_JOB_MEMORY_MB = parseInt(process.env.MAX_JOB_MEMORY_MB || '2048', 10);
+const JOB_MEMORY_MB = parseInt(process.env.JOB_MEMORY_MB || '1024', 10);
+const TASK_RETENTION_MS = parseInt(process.env.TASK_RETENTION_MS || '3600000', 10);
 
 app.use(cors());
 app.use(express.json());
 
+const pythonPath = path.join(__dirname, '../python-scripts/venv/bin/python');
+
 const tasks = {}; // Store task updates per identifier
+const taskHandlers = {}; // Completion handler per task, called when its job finishes
+
+let scheduler = null; // The scheduler.py process that queues and runs the backtests
+let schedulerRequestId = 0;
+const schedulerRequests = {}; // Pending scheduler requests by request id
+
+// Start scheduler.py, which runs jobs with bounded concurrency and memory
+function startScheduler() {
+  const schedulerPath = path.join(__dirname, '../python-scripts/scheduler.py');
+  const schedulerProcess = spawn(pythonPath, [
+    schedulerPath,
+    '--max_concurrent', `${MAX_CONCURRENT_JOBS}`,
+    '--max_memory_mb', `${MAX_JOB_MEMORY_MB}`,
+    '--retention_seconds', `${TASK_RETENTION_MS / 1000}`,
+  ]);
+
+  readline.createInterface({ input: schedulerProcess.stdout }).on('line', (line) => {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (error) {
+      console.error(`Unexpected scheduler output: ${line}`);
+      return;
+    }
+
+    if (message.event === 'output') {
+      console.log(message.line);
+      sendTaskUpdate(message.job, message.line);
+    } else if (message.event === 'finished') {
+      const handler = taskHandlers[message.job.id];
+      delete taskHandlers[message.job.id];
+      if (handler) {
+        handler(message.job);
+      }
+      // Drop the task log once the scheduler has forgotten the job too
+      setTimeout(() => delete tasks[message.job.id], TASK_RETENTION_MS);
+    } else if (schedulerRequests[message.id]) {
+      const { resolve, reject, onResult } = schedulerRequests[message.id];
+      delete schedulerRequests[message.id];
+      if (message.error) {
+        reject(new Error(message.error));
+        return;
+      }
+      // Runs before the next line is handled, unlike code after an await on the promise
+      if (onResult) {
+        onResult(message.result);
+      }
+      resolve(message.result);
+    }
+  });
+
+  schedulerProcess.stderr.on('data', (data) => console.error(`${data.toString()}`));
+
+  schedulerProcess.on('close', (code) => {
+    console.error(`scheduler.py exited with code ${code}`);
+    scheduler = null;
+    Object.keys(schedulerRequests).forEach((id) => {
+      schedulerRequests[id].reject(new Error('Scheduler exited'));
+      delete schedulerRequests[id];
+    });
+    // Jobs that were queued or running are lost with the scheduler
+    Object.keys(taskHandlers).forEach((taskId) => {
+      const handler = taskHandlers[taskId];
+      delete taskHandlers[taskId];
+      handler({ id: taskId, state: 'failed', returncode: code });
+    });
+  });
+
+  return schedulerProcess;
+}
+
+// Send a request to the scheduler and resolve with its result. `onResult` is called
+// with the result as soon as it arrives, before any later scheduler output is handled
+function schedulerRequest(op, fields, onResult) {
+  if (!scheduler) {
+    scheduler = startScheduler();
+  }
+  const id = ++schedulerRequestId;
+  return new Promise((resolve, reject) => {
+    schedulerRequests[id] = { resolve, reject, onResult };
+    scheduler.stdin.write(`${JSON.stringify({ id, op, ...fields })}\n`);
+  });
+}
+
+function sendTaskUpdate(taskId, message) {
+  console.log(`Task ${taskId} update: ${message}`);
+  if (tasks[taskId]) {
+    tasks[taskId].push(message);
+  }
+}
+
 // Function to delete a folder if it exists
 function deleteFolderIfExists(folderPath) {
   if (fs.existsSync(folderPath)) {
@@ -51,8 +152,6 @@ app.get('/api/updates/:id', (req, res) => {
   // Send stored messages if any exist (useful if the client reconnects)
   if (tasks[taskId]) {
     tasks[taskId].forEach((message) => sendProgress(message));
-  } else {
-    tasks[taskId] = [];
   }
 
   req.on('close', () => {
@@ -61,78 +160,45 @@ app.get('/api/updates/:id', (req, res) => {
 });
 
 app.post('/api/run', async (req, res) => {
-  const { name, assetName, startDate, endDate, interval, backtest_fileName } = req.body;
-  const taskId = uuidv4(); // Generate a unique task ID
-  tasks[taskId] = []; // Initialize the task log
-
-  res.json({ taskId }); // Send the unique identifier to the client
+  const { name, assetName, startDate, endDate, interval, backtest_fileName, pipeline = true } = req.body;
 
   const currentDate = new Date().toISOString().replace(/T/, '_').replace(/\..+/, '').replace(/:/g, '-');
   const folderName = `${backtest_fileName.replace('.py', '')}_${assetName}_${startDate}_to_${endDate}_${interval}_${currentDate}`;
   const folderPath = path.join(__dirname, `../public/Archive/${folderName}`);
 
-  // Define the paths to the Python interpreter and the Python script
-  const pythonPath = path.join(__dirname, '../python-scripts/venv/bin/python');
+  // Define the paths to the Python scripts
   const import_data_path = path.join(__dirname, `../python-scripts/Import_data.py`);
+  const pipeline_path = path.join(__dirname, `../python-scripts/pipeline.py`);
   const scriptPath = path.join(__dirname, `../python-scripts/${backtest_fileName}`);
 
-  // Construct the command to run the Python script with the arguments
-  const importDataCommand = [import_data_path, assetName, startDate, endDate, interval, backtest_fileName, folderPath];
+  // Backtests resume from the checkpoint of the last run with the same backtester, asset, interval
+  // and start date, so it is kept outside the timestamped (and public) results folder
+  const checkpointName = `${backtest_fileName.replace('.py', '')}_${assetName}_${interval}_${startDate}.pkl`.replace(/[\\/]/g, '_');
+  const checkpointPath = path.join(__dirname, `../checkpoints/${checkpointName}`);
 
-  const backtestCommand = [scriptPath, folderPath];
+  // Construct the commands to run the Python scripts with the arguments
+  const importDataCommand = [pythonPath, import_data_path, assetName, startDate, endDate, interval, backtest_fileName, folderPath];
+  const pipelineCommand = [pythonPath, pipeline_path, assetName, startDate, endDate, interval, backtest_fileName, folderPath, checkpointPath];
+  const backtestCommand = [pythonPath, scriptPath, folderPath];
 
-  // Run the Import_data.py script using spawn
-  const importDataProcess = spawn(pythonPath, importDataCommand);
+  // Fetch and backtest in one Python process by default; data.csv is written in the background
+  const commands = pipeline ? [pipelineCommand] : [importDataCommand, backtestCommand];
 
-  const sendTaskUpdate = (message) => {
-    console.log(`Task ${taskId} update: ${message}`); 
+  // Set up the task when the scheduler answers, so no output of its job is missed
+  const registerTask = (taskId) => {
     if (tasks[taskId]) {
-      tasks[taskId].push(message);
-    }
-  };
-  sendTaskUpdate("Importing Data...");
-
-  importDataProcess.stdout.on('data', (data) => {
-    const message = `${data.toString()}`;
-    console.log(`${message}`);  // Debug: log stdout from Import_data.py
-    sendTaskUpdate(message);
-  });
-
-  importDataProcess.stderr.on('data', (data) => {
-    const message = `${data.toString()}`;
-    console.error(`${message}`);  // Debug: log stderr from Import_data.py
-    sendTaskUpdate(message);
-  });
-
-  importDataProcess.on('close', (code) => {
-    sendTaskUpdate("Imported Data Successfully, now running Backtester...");
-    console.log(`Import_data.py process closed with code: ${code}`);  // Debug: log when Import_data.py closes
-    if (code !== 0) {
-      deleteFolderIfExists(folderPath)
-      const message = `error: Error running Import_data.py with exit code ${code}`;
-      console.error(message);  // Debug: log error exit code
-      sendTaskUpdate(message);
       return;
     }
+    tasks[taskId] = []; // Initialize the task log
+    sendTaskUpdate(taskId, pipeline ? "Queued: Importing Data and running Backtester..." : "Queued: Importing Data, then running Backtester...");
 
-    // Now run the backtest script
-    const backtestProcess = spawn(pythonPath, backtestCommand);
-
-    backtestProcess.stdout.on('data', (data) => {
-      const message = `${data.toString()}`;
-      sendTaskUpdate(message);
-    });
-
-    backtestProcess.stderr.on('data', (data) => {
-      const message = `${data.toString()}`;
-      sendTaskUpdate(message);
-    });
-
-    backtestProcess.on('close', (code) => {
-      if (code !== 0) {
+    taskHandlers[taskId] = (job) => {
+      if (job.state !== 'succeeded') {
         deleteFolderIfExists(folderPath)
-        const message = `error: Error running ${backtest_fileName} with exit code ${code}`;
-        sendTaskUpdate(message);
+        const message = job.state === 'cancelled'
+          ? 'Run cancelled'
+          : `error: Error running ${pipeline ? 'pipeline.py' : backtest_fileName} with exit code ${job.returncode}`;
+        sendTaskUpdate(taskId, message);
         return;
       }
 
@@ -148,13 +214,53 @@ app.post('/api/run', async (req, res) => {
       fs.copyFile(scriptPath.replaceAll('\\', ''), destination, (err) => {
         if (err) {
           const message = `Error Occurred`;
-          sendTaskUpdate(message);
+          sendTaskUpdate(taskId, message);
           return;
         }
-        sendTaskUpdate('Run successful!');
+        sendTaskUpdate(taskId, 'Run successful!');
       });
-    });
-  });
+    };
+  };
+
+  let taskId;
+  try {
+    // Identical requests still waiting in the queue share one job, and so one task
+    taskId = await schedulerRequest('submit', {
+      commands,
+      key: [backtest_fileName, assetName, startDate, endDate, interval, pipeline],
+      memory_mb: JOB_MEMORY_MB,
+      // Backtesters run on their own only see the checkpoint if they look for it
+      env: { BACKTEST_CHECKPOINT: checkpointPath },
+    }, registerTask);
+  } catch (error) {
+    console.error('Error submitting backtest:', error.message);
+    return res.status(500).json({ error: 'Could not queue the backtest' });
+  }
+
+  res.json({ taskId }); // Send the unique identifier to the client
+});
+
+app.get('/api/run/:id', async (req, res) => {
+  try {
+    const status = await schedulerRequest('status', { job: req.params.id });
+    if (!status) {
+      return res.status(404).json({ error: "Task not found" });
+    }
+    res.json(status);
+  } catch (error) {
+    console.error('Error fetching task status:', error.message);
+    res.status(500).json({ error: "Could not retrieve task status" });
+  }
+});
+
+app.post('/api/run/:id/cancel', async (req, res) => {
+  try {
+    const cancelled = await schedulerRequest('cancel', { job: req.params.id });
+    res.json({ cancelled });
+  } catch (error) {
+    console.error('Error cancelling task:', error.message);
+    res.status(500).json({ error: "Could not cancel task" });
+  }
 });
 
 app.get('/api/folderPath', (req, res) => {
@@ -196,6 +302,12 @@ app.get('/api/files/', (req, res) => {
   res.json(entriesList);
 });
 
+// Python modules used by the backtesters rather than backtesters themselves
+const helperScripts = [
+  'Import_data.py', 'save_backtest.py', 'pipeline.py', 'cost_model.py',
+  'incremental_backtest.py', 'multi_timeframe.py', 'scheduler.py', 'time_utils.py',
+];
+
 app.get('/api/pythonFiles', (req, res) => {
   const basePath = path.join(__dirname, '../python-scripts');
   const folderPath = req.query.path ? path.join(basePath, req.query.path) : basePath;
@@ -221,8 +333,8 @@ app.get('/api/pythonFiles', (req, res) => {
           pyFiles = pyFiles.concat(findPythonFiles(entryPath, relativePath));
         }
       } else if (entry.isFile() && path.extname(entry.name) === '.py') {
-        // Add the .py file to the list with its relative path
-        if (relativePath != 'Import_data.py' && relativePath != 'save_backtest.py') {
+        // Add the .py file to the list with its relative path, skipping the helper modules
+        if (!helperScripts.includes(relativePath)) {
           pyFiles.push(relativePath);
         }
       }
@@ -0,0 +1,140 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from backtesting import Backtest, Strategy
+
+# Add the python-scripts directory to the system path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../python-scripts')))
+from cost_model import FxCostModel
+
+class BuyAndFlip(Strategy):
+    """
+    Goes long near the start and reverses to short half way through.
+    """
+    def init(self):
+        pass
+
+    def next(self):
+        if len(self.data) == 2:
+            self.buy(size=1500)
+        elif len(self.data) == 48:
+            self.sell(size=1500)
+
+class NeverTrades(Strategy):
+    """
+    Places no orders.
+    """
+    def init(self):
+        pass
+
+    def next(self):
+        pass
+
+@pytest.fixture
+def hourly_data():
+    """
+    Four days of flat-ish hourly EUR/USD bars starting on a Monday.
+    """
+    index = pd.date_range('2024-09-02', periods=96, freq='h')
+    close = 1.10 + np.linspace(0, 0.01, len(index))
+    return pd.DataFrame({'Open': close, 'High': close + 0.0005, 'Low': close - 0.0005,
+                         'Close': close, 'Volume': 0}, index=index)
+
+def run(data, **kwargs):
+    stats = Backtest(data, BuyAndFlip, cash=100_000, exclusive_orders=True, finalize_trades=True).run()
+    return stats, FxCostModel(**kwargs).apply(stats)
+
+def test_zero_cost_model_keeps_results(hourly_data):
+    """
+    A model without costs leaves the trades and final equity unchanged.
+    """
+    stats, adjusted = run(hourly_data)
+    assert adjusted['Equity Final [$]'] == pytest.approx(stats['Equity Final [$]'])
+    assert np.allclose(adjusted._trades.PnL, stats._trades.PnL)
+
+def test_spread_slippage_and_lot_rounding(hourly_data):
+    """
+    Sizes are rounded down to whole lots and each fill pays half the spread
+    plus the slippage.
+    """
+    stats, adjusted = run(hourly_data, spread_pips=1.0, slippage_pips=0.5, lot_size=1000)
+    trades = adjusted._trades
+
+    assert list(trades.Size) == [1000, -1000]
+    assert np.allclose(trades.SpreadCost, 1000 * 0.0001)
+    assert np.allclose(trades.SlippageCost, 1000 * 2 * 0.5 * 0.0001)
+    assert adjusted['Equity Final [$]'] == pytest.approx(100_000 + trades.PnL.sum())
+
+def test_session_spreads(hourly_data):
+    """
+    Session spreads override the default spread during their hours,
+    including sessions that wrap past midnight.
+    """
+    model = FxCostModel(spread_pips=1.0, session_spreads={(21, 2): 3.0})
+    spread = model.spread(hourly_data) / 0.0001
+    hours = hourly_data.index.hour
+
+    assert np.allclose(spread[(hours >= 21) | (hours < 2)], 3.0)
+    assert np.allclose(spread[(hours >= 2) & (hours < 21)], 1.0)
+
+def test_swap_rollovers():
+    """
+    Swap is charged on weekday rollovers, three times on Wednesdays.
+    """
+    model = FxCostModel()
+    entry = pd.DatetimeIndex(['2024-09-02 12:00', '2024-09-04 12:00', '2024-09-06 12:00', '2024-09-02 12:00'], tz='UTC')
+    exit_ = pd.DatetimeIndex(['2024-09-03 12:00', '2024-09-05 12:00', '2024-09-09 12:00', '2024-09-09 12:00'], tz='UTC')
+
+    # Mon->Tue: 1, Wed->Thu: 3, Fri->Mon: 1, Mon->next Mon: 1+1+3+1+1
+    assert list(model.rollovers(entry, exit_)) == [1, 3, 1, 7]
+
+def test_swap_charged_per_held_position(hourly_data):
+    """
+    Long and short positions are charged their own swap rate per night held.
+    """
+    _, adjusted = run(hourly_data, swap_long_pips=1.0, swap_short_pips=-0.5)
+    trades = adjusted._trades
+    nights = FxCostModel().rollovers(pd.DatetimeIndex(trades.EntryTime).tz_localize('UTC'),
+                                     pd.DatetimeIndex(trades.ExitTime).tz_localize('UTC'))
+
+    assert np.allclose(trades.Swap, np.abs(trades.Size) * nights * np.array([1.0, -0.5]) * 0.0001)
+    assert adjusted['Swap [$]'] == pytest.approx(trades.Swap.sum())
+
+def test_no_trades(hourly_data):
+    """
+    A backtest without trades keeps its results and reports zero costs.
+    """
+    stats = Backtest(hourly_data, NeverTrades, cash=100_000).run()
+    adjusted = FxCostModel(spread_pips=1.0, swap_long_pips=1.0, lot_size=1000).apply(stats)
+
+    assert adjusted['Equity Final [$]'] == pytest.approx(100_000)
+    assert adjusted['Spread [$]'] == 0
+    assert adjusted['Swap [$]'] == 0
+    assert len(adjusted._trades) == 0
+
+def test_open_trade_is_charged(hourly_data):
+    """
+    The position still open at the end of the run pays the entry spread and
+    slippage and the swap accrued up to the last bar, and is rounded to lots.
+    """
+    stats = Backtest(hourly_data, BuyAndFlip, cash=100_000, exclusive_orders=True).run()
+    model = FxCostModel(spread_pips=10.0, slippage_pips=1.0, swap_long_pips=100.0,
+                        swap_short_pips=100.0, lot_size=1000)
+    adjusted = model.apply(stats)
+    trade = stats._strategy.trades[0]
+
+    entry = pd.DatetimeIndex([trade.entry_time]).tz_localize('UTC')
+    last = pd.DatetimeIndex([hourly_data.index[-1]]).tz_localize('UTC')
+    nights = model.rollovers(entry, last)[0]
+    assert nights > 0
+    assert adjusted['Swap [$]'] == pytest.approx(adjusted._trades.Swap.sum() + 1000 * nights * 100 * 0.0001)
+    assert adjusted['Spread [$]'] == pytest.approx(adjusted._trades.SpreadCost.sum() + 1000 * 10 * 0.0001 / 2)
+    assert adjusted['Slippage [$]'] == pytest.approx(adjusted._trades.SlippageCost.sum() + 1000 * 1 * 0.0001)
+
+    # The open trade is marked to the last close with its rounded size and costs
+    close = hourly_data.Close.iloc[-1]
+    open_pnl = (-1000 * (close - trade.entry_price) - 1000 * 10 * 0.0001 / 2
+                - 1000 * 0.0001 - 1000 * nights * 100 * 0.0001)
+    assert adjusted['Equity Final [$]'] == pytest.approx(100_000 + adjusted._trades.PnL.sum() + open_pnl)
@@ -0,0 +1,168 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from backtesting import Backtest, Strategy
+from backtesting.lib import crossover
+from backtesting.test import SMA
+
+# Add the python-scripts directory to the system path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../python-scripts')))
+from incremental_backtest import IncrementalBacktest
+
+class SmaCross(Strategy):
+    """
+    The SMA crossover strategy used by Backtester.py.
+    """
+    def init(self):
+        self.ma1 = self.I(SMA, self.data.Close, 10)
+        self.ma2 = self.I(SMA, self.data.Close, 20)
+
+    def next(self):
+        if crossover(self.ma1, self.ma2):
+            self.buy()
+        elif crossover(self.ma2, self.ma1):
+            self.sell()
+
+@pytest.fixture
+def data():
+    """
+    A random walk of 2000 five-minute EUR/USD bars.
+    """
+    rng = np.random.default_rng(7)
+    close = 1.10 * np.exp(np.cumsum(rng.normal(0, 3e-4, 2000)))
+    return pd.DataFrame({'Open': close, 'High': close * 1.0002, 'Low': close * 0.9998,
+                         'Close': close, 'Volume': 0},
+                        index=pd.date_range('2024-01-01', periods=len(close), freq='5min'))
+
+def run(data, checkpoint_path):
+    bt = IncrementalBacktest(data, SmaCross, checkpoint_path=checkpoint_path,
+                             commission=.002, exclusive_orders=True)
+    return bt, bt.run()
+
+def test_resumed_run_matches_full_run(data, tmp_path):
+    """
+    Appending bars and resuming from the checkpoint gives the same stats,
+    equity curve and trades as backtesting the whole history.
+    """
+    checkpoint_path = str(tmp_path / 'checkpoint.pkl')
+    full = Backtest(data, SmaCross, commission=.002, exclusive_orders=True).run()
+
+    bt, _ = run(data.iloc[:1500], checkpoint_path)
+    assert not bt.resumed
+    bt, _ = run(data.iloc[:1800], checkpoint_path)
+    assert bt.resumed
+    bt, stats = run(data, checkpoint_path)
+    assert bt.resumed
+
+    for key in full.index:
+        if key.startswith('_'):
+            continue
+        if isinstance(full[key], float):
+            assert stats[key] == pytest.approx(full[key], nan_ok=True), key
+        else:
+            assert stats[key] == full[key], key
+    assert np.allclose(stats._equity_curve.Equity, full._equity_curve.Equity)
+    pd.testing.assert_frame_equal(stats._trades[full._trades.columns], full._trades, check_dtype=False)
+
+def test_changed_history_falls_back_to_full_run(data, tmp_path):
+    """
+    If earlier bars changed since the checkpoint, the history is recomputed.
+    """
+    checkpoint_path = str(tmp_path / 'checkpoint.pkl')
+    run(data.iloc[:1500], checkpoint_path)
+
+    revised = data.copy()
+    revised.iloc[100, revised.columns.get_loc('Close')] *= 1.01
+    bt, stats = run(revised, checkpoint_path)
+
+    assert not bt.resumed
+    full = Backtest(revised, SmaCross, commission=.002, exclusive_orders=True).run()
+    assert stats['Equity Final [$]'] == pytest.approx(full['Equity Final [$]'])
+
+def test_changed_settings_fall_back_to_full_run(data, tmp_path):
+    """
+    A checkpoint is only reused with the same backtest settings.
+    """
+    checkpoint_path = str(tmp_path / 'checkpoint.pkl')
+    run(data.iloc[:1500], checkpoint_path)
+
+    bt = IncrementalBacktest(data, SmaCross, checkpoint_path=checkpoint_path,
+                             commission=.001, exclusive_orders=True)
+    bt.run()
+    assert not bt.resumed
+
+def test_finalize_trades_is_rejected(data, tmp_path):
+    """
+    Closing trades at the end of a run would lose the state to resume from.
+    """
+    with pytest.raises(ValueError):
+        IncrementalBacktest(data, SmaCross, checkpoint_path=str(tmp_path / 'checkpoint.pkl'),
+                            finalize_trades=True)
+
+def test_backtester_resumes_with_costs(data, tmp_path):
+    """
+    Running Backtester.py again after bars are appended resumes from the
+    checkpoint and saves the same cost-adjusted results as a fresh run.
+    """
+    import Backtester
+
+    folder = tmp_path / 'run'
+    folder.mkdir()
+    frame = data.rename_axis('Datetime').reset_index()
+    results_path = folder / 'results' / 'backtest_results.json'
+
+    frame.iloc[:1500].to_csv(folder / 'data.csv', index=False)
+    Backtester.run_backtest(str(folder), str(tmp_path / 'checkpoint.pkl'))
+    frame.to_csv(folder / 'data.csv', index=False)
+    Backtester.run_backtest(str(folder), str(tmp_path / 'checkpoint.pkl'))
+    resumed = pd.read_json(results_path, typ='series')
+
+    Backtester.run_backtest(str(folder), str(tmp_path / 'fresh.pkl'))
+    fresh = pd.read_json(results_path, typ='series')
+
+    for key in ('Equity Final [$]', '# Trades', 'Spread [$]', 'Swap [$]', 'Commissions [$]'):
+        assert resumed[key] == pytest.approx(fresh[key]), key
+
+def test_changed_strategy_code_falls_back_to_full_run(data, tmp_path):
+    """
+    Editing the strategy invalidates the checkpoint even when its name is unchanged.
+    """
+    import importlib.util
+
+    def load_strategy(fast, slow):
+        path = tmp_path / f'strategy_{fast}_{slow}' / 'user_strategy.py'
+        path.parent.mkdir()
+        path.write_text(
+            "from backtesting import Strategy\n"
+            "from backtesting.lib import crossover\n"
+            "from backtesting.test import SMA\n\n"
+            "class SmaCross(Strategy):\n"
+            "    def init(self):\n"
+            f"        self.ma1 = self.I(SMA, self.data.Close, {fast})\n"
+            f"        self.ma2 = self.I(SMA, self.data.Close, {slow})\n\n"
+            "    def next(self):\n"
+            "        if crossover(self.ma1, self.ma2):\n"
+            "            self.buy()\n"
+            "        elif crossover(self.ma2, self.ma1):\n"
+            "            self.sell()\n")
+        spec = importlib.util.spec_from_file_location('user_strategy', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module.SmaCross
+
+    checkpoint_path = str(tmp_path / 'checkpoint.pkl')
+    original, edited = load_strategy(10, 20), load_strategy(5, 50)
+    assert (original.__module__, original.__qualname__) == (edited.__module__, edited.__qualname__)
+
+    IncrementalBacktest(data.iloc[:1500], original, checkpoint_path=checkpoint_path,
+                        commission=.002, exclusive_orders=True).run()
+    bt = IncrementalBacktest(data, edited, checkpoint_path=checkpoint_path,
+                             commission=.002, exclusive_orders=True)
+    stats = bt.run()
+
+    assert not bt.resumed
+    full = Backtest(data, edited, commission=.002, exclusive_orders=True).run()
+    assert stats['# Trades'] == full['# Trades']
+    assert stats['Equity Final [$]'] == pytest.approx(full['Equity Final [$]'])
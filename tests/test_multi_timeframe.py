@@ -0,0 +1,82 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from backtesting import Backtest, Strategy
+from backtesting.test import SMA
+
+# Add the python-scripts directory to the system path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../python-scripts')))
+from multi_timeframe import TimeframeAlignment, resample_indicator
+
+@pytest.fixture
+def data():
+    """
+    Five-minute bars over two trading days, with a weekend gap, in the
+    layout Import_data.py writes (a 'Datetime' column, no datetime index).
+    """
+    times = pd.date_range('2024-09-05', periods=12 * 48, freq='5min')
+    times = times.append(pd.date_range('2024-09-09', periods=12 * 24, freq='5min'))
+    close = 1.10 + 0.001 * np.sin(np.arange(len(times)) / 20)
+    return pd.DataFrame({'Datetime': times.astype(str), 'Open': close, 'High': close + 0.0002,
+                         'Low': close - 0.0002, 'Close': close, 'Volume': 0})
+
+def test_alignment_has_no_lookahead(data):
+    """
+    Each base bar sees only the higher timeframe bars that closed by its own close.
+    """
+    times = pd.DatetimeIndex(pd.to_datetime(data['Datetime']))
+    alignment = TimeframeAlignment(times, '1h')
+
+    for i in range(len(times)):
+        completed = alignment.higher_times + pd.Timedelta('1h') <= times[i] + pd.Timedelta('5min')
+        expected = np.flatnonzero(completed)
+        assert alignment.index[i] == (expected[-1] if len(expected) else -1)
+
+    # The 10:55 bar closes the 10:00 hour; the 10:50 bar does not
+    assert alignment.higher_times[alignment.index[times.get_loc('2024-09-05 10:55')]] == pd.Timestamp('2024-09-05 10:00')
+    assert alignment.higher_times[alignment.index[times.get_loc('2024-09-05 10:50')]] == pd.Timestamp('2024-09-05 09:00')
+
+def test_resample_and_align(data):
+    """
+    Resampled bars aggregate OHLC correctly and aligned values are NaN until
+    the first higher timeframe bar closes.
+    """
+    times = pd.DatetimeIndex(pd.to_datetime(data['Datetime']))
+    alignment = TimeframeAlignment(times, '1D')
+    daily = alignment.resample(data)
+
+    assert list(daily.index) == list(pd.to_datetime(['2024-09-05', '2024-09-06', '2024-09-09']))
+    assert daily['Close'].iloc[0] == data['Close'].iloc[12 * 24 - 1]
+    assert daily['High'].iloc[1] == data['High'].iloc[12 * 24:12 * 48].max()
+
+    aligned = alignment.align(daily['Close'])
+    assert np.isnan(aligned[:12 * 24 - 1]).all()
+    assert aligned[12 * 24 - 1] == daily['Close'].iloc[0]
+    assert aligned[-2] == daily['Close'].iloc[1]  # Monday closes on its last bar
+    assert aligned[-1] == daily['Close'].iloc[2]
+
+class HourlyTrend(Strategy):
+    """
+    Trades 5m crossovers of price and a 1h SMA.
+    """
+    def init(self):
+        self.trend = resample_indicator(self, '1h', SMA, 3)
+
+    def next(self):
+        if self.data.Close[-1] > self.trend[-1] and not self.position.is_long:
+            self.buy()
+        elif self.data.Close[-1] < self.trend[-1] and not self.position.is_short:
+            self.sell()
+
+def test_strategy_reads_higher_timeframe_indicator(data):
+    """
+    A higher timeframe indicator is a base-length array usable in Strategy.next.
+    """
+    stats = Backtest(data, HourlyTrend, exclusive_orders=True).run()
+
+    trend = stats._strategy.trend
+    assert len(trend) == len(data)
+    assert trend.name == '1h SMA(3)'
+    assert stats['# Trades'] > 0
@@ -0,0 +1,73 @@
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add the python-scripts directory to the system path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../python-scripts')))
+import pipeline
+from incremental_backtest import IncrementalBacktest
+
+@pytest.fixture
+def fetched():
+    """
+    Hourly data in the shape yfinance returns: a 'Datetime' index and a
+    (Price, Ticker) column MultiIndex.
+    """
+    index = pd.date_range('2024-09-02', periods=200, freq='h', tz='UTC', name='Datetime')
+    close = 1.10 + 0.002 * np.sin(np.arange(len(index)) / 8)
+    columns = pd.MultiIndex.from_product([['Close', 'High', 'Low', 'Open', 'Volume'], ['EURUSD=X']],
+                                         names=['Price', 'Ticker'])
+    return pd.DataFrame(np.column_stack([close, close + 0.0005, close - 0.0005, close, np.zeros(len(close))]),
+                        index=index, columns=columns)
+
+def test_as_csv_frame(fetched):
+    """
+    The in-process frame has the columns a backtester reading data.csv sees.
+    """
+    frame = pipeline.as_csv_frame(fetched)
+
+    assert list(frame.columns) == ['Datetime', 'Close', 'High', 'Low', 'Open', 'Volume']
+    assert isinstance(frame.index, pd.RangeIndex)
+
+def test_run_pipeline(fetched, tmp_path, monkeypatch):
+    """
+    The pipeline backtests the fetched data in-process and still archives data.csv.
+    """
+    monkeypatch.setattr(pipeline, 'fetch_data', lambda *args: fetched)
+    folder_path = str(tmp_path / 'run')
+
+    pipeline.run_pipeline('EURUSD=X', '2024-09-02', '2024-09-10', '1h', 'Backtester.py', folder_path)
+
+    assert os.path.exists(os.path.join(folder_path, 'data.csv'))
+    with open(os.path.join(folder_path, 'results', 'backtest_results.json')) as f:
+        results = json.load(f)
+    assert results['# Trades'] > 0
+
+def test_run_pipeline_keeps_checkpoint_across_folders(fetched, tmp_path, monkeypatch):
+    """
+    A checkpoint passed by the server is shared by runs writing to different
+    result folders, and nothing is checkpointed inside them.
+    """
+    monkeypatch.setattr(pipeline, 'fetch_data', lambda *args: fetched.iloc[:150])
+    checkpoint_path = str(tmp_path / 'checkpoints' / 'Backtester_EURUSD=X_1h_2024-09-02.pkl')
+    pipeline.run_pipeline('EURUSD=X', '2024-09-02', '2024-09-08', '1h', 'Backtester.py',
+                          str(tmp_path / 'first'), checkpoint_path)
+    assert os.path.exists(checkpoint_path)
+
+    monkeypatch.setattr(pipeline, 'fetch_data', lambda *args: fetched)
+    resumed = []
+    original = IncrementalBacktest.run
+
+    def run(self, **kwargs):
+        stats = original(self, **kwargs)
+        resumed.append(self.resumed)
+        return stats
+    monkeypatch.setattr(IncrementalBacktest, 'run', run)
+
+    pipeline.run_pipeline('EURUSD=X', '2024-09-02', '2024-09-10', '1h', 'Backtester.py',
+                          str(tmp_path / 'second'), checkpoint_path)
+    assert resumed == [True]
+    assert not os.path.exists(str(tmp_path / 'second' / 'results' / 'checkpoint.pkl'))
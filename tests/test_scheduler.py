@@ -0,0 +1,178 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import pytest
+
+# Add the python-scripts directory to the system path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../python-scripts')))
+from scheduler import JobScheduler, SUCCEEDED, FAILED, CANCELLED, RUNNING
+
+def python_command(code):
+    return [sys.executable, '-c', code]
+
+@pytest.fixture
+def scheduler():
+    scheduler = JobScheduler(max_concurrent=1)
+    yield scheduler
+    scheduler.shutdown()
+
+def test_job_runs_and_logs_output(scheduler):
+    """
+    A job runs its commands in order and records their output.
+    """
+    job_id = scheduler.submit([python_command("print('import')"), python_command("print('backtest')")])
+
+    assert scheduler.wait(job_id, timeout=30) == SUCCEEDED
+    assert scheduler.logs(job_id) == ['import', 'backtest']
+
+def test_failed_command_stops_job(scheduler):
+    """
+    A failing command marks the job as failed and skips the remaining commands.
+    """
+    job_id = scheduler.submit([python_command("import sys; sys.exit(3)"), python_command("print('never')")])
+
+    assert scheduler.wait(job_id, timeout=30) == FAILED
+    assert scheduler.status(job_id)['returncode'] == 3
+    assert scheduler.logs(job_id) == []
+
+def test_job_environment(scheduler):
+    """
+    A job's environment variables are set for its commands only.
+    """
+    code = "import os; print(os.environ.get('BACKTEST_CHECKPOINT'))"
+    with_env = scheduler.submit([python_command(code)], env={'BACKTEST_CHECKPOINT': 'checkpoint.pkl'})
+    without_env = scheduler.submit([python_command(code)])
+
+    scheduler.wait(with_env, timeout=30)
+    scheduler.wait(without_env, timeout=30)
+    assert scheduler.logs(with_env) == ['checkpoint.pkl']
+    assert scheduler.logs(without_env) == ['None']
+
+def test_identical_pending_requests_are_collapsed(scheduler):
+    """
+    Submitting the same request while it is pending returns the same job.
+    """
+    blocker = scheduler.submit([python_command("import time; time.sleep(0.5)")])
+    first = scheduler.submit([python_command("print('a')")], key='EURUSD=X-1d')
+    second = scheduler.submit([python_command("print('a')")], key='EURUSD=X-1d')
+
+    assert first == second
+    assert scheduler.wait(first, timeout=30) == SUCCEEDED
+    scheduler.wait(blocker, timeout=30)
+
+def test_priority_and_concurrency(scheduler):
+    """
+    Only one job runs at a time and lower priority values run first.
+    """
+    blocker = scheduler.submit([python_command("import time; time.sleep(0.5)")])
+    low = scheduler.submit([python_command("print('low')")], priority=5)
+    high = scheduler.submit([python_command("print('high')")], priority=1)
+
+    scheduler.wait(low, timeout=30)
+    assert scheduler.status(high)['finished_at'] <= scheduler.status(low)['started_at']
+    assert scheduler.status(blocker)['finished_at'] <= scheduler.status(high)['started_at']
+
+def test_memory_limit_rejects_oversized_job():
+    """
+    A job that can never fit in the memory budget is rejected on submit.
+    """
+    scheduler = JobScheduler(max_concurrent=2, max_memory_mb=512)
+    try:
+        with pytest.raises(ValueError):
+            scheduler.submit([python_command("pass")], memory_mb=1024)
+    finally:
+        scheduler.shutdown()
+
+def test_memory_limit_requires_a_reservation():
+    """
+    With a memory budget, every job must say how much memory it reserves.
+    """
+    scheduler = JobScheduler(max_concurrent=2, max_memory_mb=512)
+    try:
+        with pytest.raises(ValueError):
+            scheduler.submit([python_command("pass")])
+    finally:
+        scheduler.shutdown()
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason="Resident memory is read from /proc")
+def test_memory_reservation_is_enforced(scheduler):
+    """
+    A job whose resident memory grows past its reservation is stopped.
+    """
+    job_id = scheduler.submit([python_command("import time; x = b'1' * (512 * 1024 * 1024); time.sleep(30)")],
+                              memory_mb=256)
+
+    assert scheduler.wait(job_id, timeout=30) == FAILED
+    assert any('reservation' in line for line in scheduler.logs(job_id))
+
+def test_job_within_reservation_runs(scheduler):
+    """
+    The reservation limits resident memory, not the address space a process reserves.
+    """
+    job_id = scheduler.submit([python_command("import mmap; m = mmap.mmap(-1, 1024 ** 3); print('mapped')")],
+                              memory_mb=256)
+
+    assert scheduler.wait(job_id, timeout=30) == SUCCEEDED
+    assert scheduler.logs(job_id) == ['mapped']
+
+def test_cancel_running_job(scheduler):
+    """
+    Cancelling a running job terminates its process.
+    """
+    job_id = scheduler.submit([python_command("import time; print('started', flush=True); time.sleep(30)")])
+    deadline = time.time() + 30
+    while scheduler.status(job_id)['state'] != RUNNING or not scheduler.logs(job_id):
+        assert time.time() < deadline
+        time.sleep(0.05)
+
+    assert scheduler.cancel(job_id)
+    assert scheduler.wait(job_id, timeout=30) == CANCELLED
+    assert not scheduler.cancel(job_id)
+
+def test_finished_jobs_expire():
+    """
+    Finished jobs and their logs are removed after the retention period.
+    """
+    scheduler = JobScheduler(retention_seconds=0.1)
+    try:
+        job_id = scheduler.submit([python_command("print('done')")])
+        scheduler.wait(job_id, timeout=30)
+        time.sleep(0.2)
+        assert scheduler.status(job_id) is None
+        assert scheduler.logs(job_id) is None
+    finally:
+        scheduler.shutdown()
+
+def test_service_protocol():
+    """
+    The scheduler service answers requests and reports job output and
+    completion as JSON lines.
+    """
+    script = os.path.join(os.path.dirname(__file__), '../python-scripts/scheduler.py')
+    service = subprocess.Popen([sys.executable, script, '--max_concurrent', '1'], stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, text=True, bufsize=1)
+    try:
+        def request(message):
+            service.stdin.write(json.dumps(message) + '\n')
+            service.stdin.flush()
+            return json.loads(service.stdout.readline())
+
+        submitted = request({'id': 1, 'op': 'submit', 'commands': [python_command("print('hello')")],
+                             'key': ['EURUSD=X', '1d']})
+        assert submitted['id'] == 1
+        job_id = submitted['result']
+
+        events = []
+        while not events or events[-1]['event'] != 'finished':
+            events.append(json.loads(service.stdout.readline()))
+        assert events[0] == {'event': 'output', 'job': job_id, 'line': 'hello'}
+        assert events[-1]['job']['state'] == SUCCEEDED
+
+        assert request({'id': 2, 'op': 'logs', 'job': job_id}) == {'id': 2, 'result': ['hello']}
+        assert request({'id': 3, 'op': 'cancel', 'job': job_id}) == {'id': 3, 'result': False}
+        assert 'error' in request({'id': 4, 'op': 'unknown'})
+    finally:
+        service.stdin.close()
+        service.wait(timeout=30)